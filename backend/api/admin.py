@@ -0,0 +1,59 @@
+import os
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Последние профили запросов; файл открывается в speedscope.app."""
+    list_display = (
+        'created', 'method', 'path', 'view', 'status_code', 'duration',
+        'query_count', 'query_time', 'user', 'download'
+    )
+    list_filter = ('view', 'method', 'status_code')
+    search_fields = ('path', 'view')
+    readonly_fields = [
+        field.name for field in RequestProfile._meta.fields
+    ] + ['download']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='api_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description='Профиль')
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:api_requestprofile_download', args=(obj.pk,)),
+            'Скачать',
+        )
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        filename = os.path.join(settings.PROFILES_ROOT, profile.filename)
+        if not os.path.isfile(filename):
+            raise Http404('Файл не найден.')
+        return FileResponse(
+            open(filename, 'rb'), content_type='application/json',
+            as_attachment=True, filename=profile.filename,
+        )
@@ -0,0 +1,154 @@
+"""
+Кеш сериализованных фрагментов API.
+
+Общие для всех пользователей части ответа (тело рецепта, данные автора)
+хранятся по ключу объекта. Зависящие от пользователя флаги собираются
+из закешированных множеств id: избранного, корзины и подписок.
+Сброс выполняется сигналами после фиксации транзакции.
+
+Целиком кешируются только ответы для анонимных пользователей
+(см. PrecompressedResponseMiddleware). Версия ответов своя у каждого
+семейства: справочники (теги, ингредиенты) меняются только вместе
+с версией справочников, ответы с рецептами - ещё и при изменении
+рецептов и их авторов.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+RECIPE_KEY = 'api:recipe:{version}:{pk}'
+AUTHOR_KEY = 'api:author:{pk}'
+AUTHOR_STATS_KEY = 'api:author-stats:{version}:{pk}'
+USER_IDS_KEY = 'api:user:{pk}:{kind}'
+CATALOGUE_VERSION_KEY = 'api:catalogue-version'
+RECIPE_RESPONSES_VERSION_KEY = 'api:recipe-responses-version'
+RESPONSE_KEY = 'api:response:{version}:{digest}'
+
+CATALOGUE = 'catalogue'
+RECIPES = 'recipes'
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+FOLLOWS = 'follows'
+
+
+def get_catalogue_version():
+    """Версия справочников: теги и ингредиенты входят в тело рецепта."""
+    return cache.get_or_set(
+        CATALOGUE_VERSION_KEY, time.time_ns, timeout=None
+    )
+
+
+def get_responses_version(family):
+    """Версия публичных ответов семейства CATALOGUE или RECIPES."""
+    catalogue = get_catalogue_version()
+    if family == CATALOGUE:
+        return catalogue
+    recipes = cache.get_or_set(
+        RECIPE_RESPONSES_VERSION_KEY, time.time_ns, timeout=None
+    )
+    return f'{catalogue}.{recipes}'
+
+
+def get_many(key_template, pks, build, **key_kwargs):
+    """
+    Фрагменты для pks из кеша; недостающие строятся одним вызовом build
+    и сохраняются.
+    """
+    keys = {key_template.format(pk=pk, **key_kwargs): pk for pk in pks}
+    fragments = {
+        keys[key]: fragment
+        for key, fragment in cache.get_many(keys).items()
+    }
+    missing = [pk for pk in keys.values() if pk not in fragments]
+    metrics.count_cache(
+        key_template.split(':')[1], len(fragments), len(missing)
+    )
+    if missing:
+        built = build(missing)
+        cache.set_many(
+            {
+                key_template.format(pk=pk, **key_kwargs): fragment
+                for pk, fragment in built.items()
+            },
+            timeout=settings.API_CACHE_TIMEOUT
+        )
+        fragments.update(built)
+    return fragments
+
+
+def get_user_ids(user, builders):
+    """
+    Множества id, связанных с пользователем, по видам из builders
+    (вид -> функция, строящая множество). Один запрос к кешу на все виды.
+    """
+    keys = {
+        USER_IDS_KEY.format(pk=user.pk, kind=kind): kind for kind in builders
+    }
+    ids = {
+        keys[key]: value for key, value in cache.get_many(keys).items()
+    }
+    missing = {
+        USER_IDS_KEY.format(pk=user.pk, kind=kind): builders[kind]()
+        for kind in builders if kind not in ids
+    }
+    metrics.count_cache('user_ids', len(ids), len(missing))
+    if missing:
+        cache.set_many(missing, timeout=settings.API_CACHE_TIMEOUT)
+        ids.update((keys[key], value) for key, value in missing.items())
+    return ids
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def _delete_on_commit(keys, responses=True):
+    def delete():
+        cache.delete_many(keys)
+        if responses:
+            _bump_version(RECIPE_RESPONSES_VERSION_KEY)
+
+    transaction.on_commit(delete)
+
+
+def invalidate_recipes(*pks):
+    version = get_catalogue_version()
+    _delete_on_commit(
+        [RECIPE_KEY.format(version=version, pk=pk) for pk in pks]
+    )
+
+
+def invalidate_authors(*pks, responses=True):
+    """
+    Данные авторов; responses=False - изменение не видно в ответах
+    с рецептами (например, у пользователя нет рецептов).
+    """
+    _delete_on_commit(
+        [AUTHOR_KEY.format(pk=pk) for pk in pks], responses=responses
+    )
+
+
+def invalidate_author_stats(*pks):
+    """Статистика автора; теги в ней сбрасывает версия справочников."""
+    version = get_catalogue_version()
+    keys = [AUTHOR_STATS_KEY.format(version=version, pk=pk) for pk in pks]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_user_ids(user_pk, kind):
+    transaction.on_commit(lambda: cache.delete(
+        USER_IDS_KEY.format(pk=user_pk, kind=kind)
+    ))
+
+
+def invalidate_catalogue():
+    # Версия справочников входит и в версию ответов с рецептами.
+    transaction.on_commit(lambda: _bump_version(CATALOGUE_VERSION_KEY))
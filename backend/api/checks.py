@@ -0,0 +1,37 @@
+"""Проверки настроек для запуска в продакшене (manage.py check)."""
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or settings.SHARED_CACHE:
+        return []
+    return [Warning(
+        'Кеш хранится в памяти процесса (LocMemCache).',
+        hint=(
+            'Лимиты запросов считаются отдельно в каждом процессе, '
+            'а сброс кеша из worker и events не доходит до backend. '
+            'Укажите общий кеш в CACHE_BACKEND и CACHE_LOCATION, '
+            'например Redis.'
+        ),
+        id='api.W001',
+    )]
+
+
+@register()
+def check_site_url(app_configs, **kwargs):
+    if settings.DEBUG or urlparse(settings.SITE_URL).hostname not in (
+        'localhost', '127.0.0.1'
+    ):
+        return []
+    return [Warning(
+        f'SITE_URL указывает на локальный адрес: {settings.SITE_URL}.',
+        hint=(
+            'Из SITE_URL строятся ссылки и картинки страниц для соцсетей. '
+            'Укажите в SITE_URL адрес сайта, например https://example.com.'
+        ),
+        id='api.W002',
+    )]
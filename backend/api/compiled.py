@@ -0,0 +1,240 @@
+"""
+Скомпилированная сериализация рецептов для чтения.
+
+Вместо дерева полей DRF на каждый объект используются заранее
+составленные списки пар (поле, функция доступа), которые превращают
+строки `.values()` сразу в словари ответа. Порядок и набор полей берутся
+из Meta.fields обычных сериализаторов, поэтому результат совпадает
+с RecipeReadSerializer байт в байт.
+
+Общие для всех пользователей фрагменты (тело рецепта, автор) берутся
+из кеша, поверх них накладываются флаги текущего пользователя.
+Параметры ?fields=, ?omit= и ?expand= сокращают план и пропускают
+загрузку авторов и флагов, если они не нужны.
+"""
+from collections import defaultdict
+from operator import itemgetter
+
+from django.db.models import Count, Q
+from recipes.models import (Favorite, Follow, Recipe, RecipeIngredient,
+                            ShoppingCart, User)
+
+from . import cache
+from .fieldsets import FieldSelection
+from .serializers import (RecipeIngredientSerializer, RecipeReadSerializer,
+                          SyncAuthorSerializer, SyncRecipeSerializer,
+                          TagSerializer, UserSerializer)
+
+RECIPE_VALUES = ('id', 'author_id', 'name', 'image', 'text', 'cooking_time')
+USER_VALUES = ('id', 'email', 'username', 'first_name', 'last_name', 'avatar')
+TAG_VALUES = ('recipe_id', 'tag_id', 'tag__name', 'tag__slug')
+INGREDIENT_VALUES = (
+    'recipe_id', 'ingredient_id', 'ingredient__name',
+    'ingredient__measurement_unit', 'amount'
+)
+
+
+def compile_fields(fields, accessors):
+    """Пары (поле, функция доступа) в порядке полей сериализатора."""
+    return tuple((field, accessors[field]) for field in fields)
+
+
+def render(plan, row):
+    return {field: accessor(row) for field, accessor in plan}
+
+
+STORAGE = Recipe._meta.get_field('image').storage
+
+
+def storage_url(name):
+    return STORAGE.url(name) if name else None
+
+
+TAG_PLAN = compile_fields(TagSerializer.Meta.fields, {
+    'id': itemgetter('tag_id'),
+    'name': itemgetter('tag__name'),
+    'slug': itemgetter('tag__slug'),
+})
+
+INGREDIENT_PLAN = compile_fields(RecipeIngredientSerializer.Meta.fields, {
+    'id': itemgetter('ingredient_id'),
+    'name': itemgetter('ingredient__name'),
+    'measurement_unit': itemgetter('ingredient__measurement_unit'),
+    'amount': itemgetter('amount'),
+})
+
+
+def build_recipe_fragments(recipe_ids):
+    """
+    Общая для всех часть рецепта: поля, теги и ингредиенты.
+    Картинка хранится относительной ссылкой, автор - по id.
+    """
+    tags = defaultdict(list)
+    for row in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag__name').values(*TAG_VALUES):
+        tags[row['recipe_id']].append(render(TAG_PLAN, row))
+
+    ingredients = defaultdict(list)
+    for row in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('pk').values(*INGREDIENT_VALUES):
+        ingredients[row['recipe_id']].append(render(INGREDIENT_PLAN, row))
+
+    return {
+        row['id']: {
+            **row,
+            'image': storage_url(row['image']),
+            'ingredients': ingredients[row['id']],
+            'tags': tags[row['id']],
+        }
+        for row in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values(*RECIPE_VALUES)
+    }
+
+
+def build_author_fragments(author_ids):
+    """Общая для всех часть автора, без is_subscribed."""
+    return {
+        row['id']: {**row, 'avatar': storage_url(row['avatar'])}
+        for row in User.objects.filter(pk__in=author_ids).annotate(
+            shopping_cart_count=Count(
+                'shoppingcarts',
+                filter=Q(shoppingcarts__recipe__is_hidden=False)
+            )
+        ).values(*USER_VALUES, 'shopping_cart_count')
+    }
+
+
+def user_ids_builders(user):
+    """Функции, строящие множества id для флагов пользователя."""
+    return {
+        cache.FAVORITES: lambda: set(Favorite.objects.filter(
+            user=user
+        ).values_list('recipe_id', flat=True)),
+        cache.SHOPPING_CART: lambda: set(ShoppingCart.objects.filter(
+            user=user
+        ).values_list('recipe_id', flat=True)),
+        cache.FOLLOWS: lambda: set(Follow.objects.filter(
+            user=user
+        ).values_list('author_id', flat=True)),
+    }
+
+
+class CompiledRecipeSerializer:
+    """
+    Быстрая замена RecipeReadSerializer(many=True) для списков.
+
+    Фрагменты страницы берутся из кеша; промахи загружаются
+    фиксированным числом запросов, независимо от количества рецептов.
+    """
+    recipe_fields = RecipeReadSerializer.Meta.fields
+    author_fields = UserSerializer.Meta.fields
+
+    def __init__(self, request=None, selection=None):
+        self.request = request
+        self.user = getattr(request, 'user', None)
+        self.selection = selection or FieldSelection()
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    def absolute_url(self, url):
+        if url is None or self.request is None:
+            return url
+        return self.request.build_absolute_uri(url)
+
+    def get_user_ids(self):
+        if not self.is_authenticated:
+            return defaultdict(set)
+        return cache.get_user_ids(self.user, user_ids_builders(self.user))
+
+    def get_author_plan(self, followed):
+        if self.request is None:
+            def is_subscribed(author):
+                return None
+        else:
+            def is_subscribed(author):
+                return self.is_authenticated and author['id'] in followed
+
+        return compile_fields(self.author_fields, {
+            'id': itemgetter('id'),
+            'email': itemgetter('email'),
+            'username': itemgetter('username'),
+            'first_name': itemgetter('first_name'),
+            'last_name': itemgetter('last_name'),
+            'is_subscribed': is_subscribed,
+            'avatar': lambda author: self.absolute_url(author['avatar']),
+            'shopping_cart_count': itemgetter('shopping_cart_count'),
+        })
+
+    def serialize(self, recipe_ids):
+        """Сериализует рецепты с указанными id, сохраняя их порядок."""
+        selection = self.selection
+        recipe_ids = list(recipe_ids)
+        recipes = cache.get_many(
+            cache.RECIPE_KEY, recipe_ids, build_recipe_fragments,
+            version=cache.get_catalogue_version()
+        )
+        if selection.expands('author'):
+            authors = cache.get_many(
+                cache.AUTHOR_KEY,
+                {recipe['author_id'] for recipe in recipes.values()},
+                build_author_fragments
+            )
+        fields = selection.filter(self.recipe_fields)
+        if (
+            'is_favorited' in fields
+            or 'is_in_shopping_cart' in fields
+            or (
+                'is_subscribed' in self.author_fields
+                and selection.expands('author')
+            )
+        ):
+            user_ids = self.get_user_ids()
+        else:
+            user_ids = defaultdict(set)
+        favorites = user_ids[cache.FAVORITES]
+        shopping_cart = user_ids[cache.SHOPPING_CART]
+        author_plan = self.get_author_plan(user_ids[cache.FOLLOWS])
+
+        accessors = {
+            'id': itemgetter('id'),
+            'author': lambda recipe: render(
+                author_plan, authors[recipe['author_id']]
+            ),
+            'name': itemgetter('name'),
+            'image': lambda recipe: self.absolute_url(recipe['image']),
+            'text': itemgetter('text'),
+            'ingredients': itemgetter('ingredients'),
+            'tags': itemgetter('tags'),
+            'cooking_time': itemgetter('cooking_time'),
+            'is_favorited': lambda recipe: recipe['id'] in favorites,
+            'is_in_shopping_cart': (
+                lambda recipe: recipe['id'] in shopping_cart
+            ),
+        }
+        collapsed = {
+            'author': itemgetter('author_id'),
+            'ingredients': lambda recipe: [
+                ingredient['id'] for ingredient in recipe['ingredients']
+            ],
+            'tags': lambda recipe: [tag['id'] for tag in recipe['tags']],
+        }
+        for field, accessor in collapsed.items():
+            if not selection.expands(field):
+                accessors[field] = accessor
+
+        plan = compile_fields(fields, accessors)
+        return [
+            render(plan, recipes[recipe_id])
+            for recipe_id in recipe_ids if recipe_id in recipes
+        ]
+
+
+class CompiledSyncRecipeSerializer(CompiledRecipeSerializer):
+    """Замена SyncRecipeSerializer(many=True): без флагов пользователя."""
+    recipe_fields = SyncRecipeSerializer.Meta.fields
+    author_fields = SyncAuthorSerializer.Meta.fields
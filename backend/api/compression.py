@@ -0,0 +1,72 @@
+"""
+Сжатие тел ответов: выбор кодировки по Accept-Encoding и подготовка
+вариантов gzip/brotli. Brotli используется, если установлен пакет.
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = 'identity'
+
+
+def compress_gzip(content):
+    return gzip.compress(
+        content, compresslevel=settings.PRECOMPRESS_GZIP_LEVEL, mtime=0
+    )
+
+
+def compress_brotli(content):
+    return brotli.compress(
+        content, quality=settings.PRECOMPRESS_BROTLI_QUALITY
+    )
+
+
+COMPRESSORS = {'gzip': compress_gzip}
+if brotli is not None:
+    COMPRESSORS = {'br': compress_brotli, **COMPRESSORS}
+
+
+def compress_variants(content):
+    """Тело ответа во всех доступных кодировках, включая исходное."""
+    variants = {IDENTITY: content}
+    if len(content) >= settings.PRECOMPRESS_MIN_SIZE:
+        for coding, compress in COMPRESSORS.items():
+            compressed = compress(content)
+            if len(compressed) < len(content):
+                variants[coding] = compressed
+    return variants
+
+
+def parse_accept_encoding(header):
+    """Словарь кодировка -> q из заголовка Accept-Encoding."""
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding.strip().lower()] = quality
+    return codings
+
+
+def choose_encoding(header, available):
+    """Лучшая из доступных кодировок; при равном q - в порядке COMPRESSORS."""
+    codings = parse_accept_encoding(header or '')
+    wildcard = codings.get('*', 0.0)
+    best, best_quality = IDENTITY, 0.0
+    for coding in COMPRESSORS:
+        quality = codings.get(coding, wildcard)
+        if coding in available and quality > best_quality:
+            best, best_quality = coding, quality
+    return best
@@ -0,0 +1,101 @@
+"""
+Отдача сгенерированных файлов.
+
+Файл записывается в EXPORTS_ROOT, а в продакшене вместо тела ответа
+возвращается заголовок X-Accel-Redirect: файл отправляет nginx из
+internal-локации EXPORTS_ACCEL_PREFIX, и воркер gunicorn сразу
+освобождается. В разработке файл отдаёт Django. Для передачи файла
+без авторизации выдаётся подписанная ссылка с ограниченным сроком.
+Одинаковое содержимое записывается один раз: каталог файла назван
+по хешу содержимого. Старые файлы удаляет периодическая задача
+clean_exports.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import time
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse
+
+SALT = 'api.exports'
+
+
+def save_export(content, filename):
+    """
+    Записывает файл в каталог с хешем содержимого и возвращает его имя.
+    Если такой файл уже есть, продлевает ему срок хранения.
+    """
+    content = content.encode() if isinstance(content, str) else content
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    name = f'{digest}/{filename}'
+    path = os.path.join(settings.EXPORTS_ROOT, name)
+    directory = os.path.dirname(path)
+    if os.path.isfile(path):
+        os.utime(directory)
+        return name
+    os.makedirs(directory, exist_ok=True)
+    # Параллельный запрос с тем же содержимым не увидит файл недописанным.
+    temporary = f'{path}.{uuid.uuid4().hex}'
+    with open(temporary, 'wb') as file:
+        file.write(content)
+    os.replace(temporary, path)
+    return name
+
+
+def file_response(name):
+    """Ответ с файлом из EXPORTS_ROOT."""
+    path = os.path.join(settings.EXPORTS_ROOT, name)
+    if not os.path.isfile(path):
+        raise Http404('Файл не найден.')
+
+    filename = os.path.basename(name)
+    content_type = (
+        mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    if not settings.USE_X_ACCEL_REDIRECT:
+        return FileResponse(
+            open(path, 'rb'), content_type=content_type,
+            as_attachment=True, filename=filename,
+        )
+
+    response = HttpResponse(content_type=content_type)
+    response['X-Accel-Redirect'] = quote(settings.EXPORTS_ACCEL_PREFIX + name)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_response(content, filename):
+    return file_response(save_export(content, filename))
+
+
+def sign(name):
+    return signing.dumps(name, salt=SALT)
+
+
+def unsign(token):
+    """Имя файла из подписанной ссылки; Http404 для чужой или старой."""
+    try:
+        return signing.loads(
+            token, salt=SALT, max_age=settings.EXPORTS_LINK_MAX_AGE
+        )
+    except signing.BadSignature:
+        raise Http404('Ссылка недействительна или устарела.')
+
+
+def clean_exports(max_age):
+    """Удаляет каталоги файлов старше max_age секунд."""
+    if not os.path.isdir(settings.EXPORTS_ROOT):
+        return 0
+    deadline = time.time() - max_age
+    removed = 0
+    with os.scandir(settings.EXPORTS_ROOT) as entries:
+        for entry in entries:
+            if entry.is_dir() and entry.stat().st_mtime < deadline:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+    return removed
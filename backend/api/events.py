@@ -0,0 +1,317 @@
+"""
+Server-sent events о новых рецептах авторов из подписок.
+
+Эндпоинт EVENTS_PATH обслуживает ASGI-приложение из backend/asgi.py,
+в обход Django: соединение - это корутина с очередью, поэтому один
+процесс держит тысячи простаивающих клиентов. Раз в EVENTS_HEARTBEAT
+секунд в поток пишется комментарий, чтобы прокси не закрывали
+соединение.
+
+Внутри процесса события раздаёт Hub: по новому событию он одним
+запросом находит среди подключённых пользователей подписчиков автора.
+Между процессами события передаёт бэкенд из EVENTS_BACKEND:
+- DatabaseBackend - один опрос таблицы RecipeEvent на процесс. Событие
+  из долгой транзакции может появиться уже после событий с большим id,
+  поэтому события последних EVENTS_COMMIT_LAG секунд читаются повторно;
+- LocalBackend - без опроса, для одного процесса, который и создаёт
+  рецепты, и держит соединения.
+
+Клиент, переподключившийся с заголовком Last-Event-ID, получает
+пропущенные события из RecipeEvent, но не больше EVENTS_REPLAY_LIMIT.
+"""
+import asyncio
+import contextvars
+import logging
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from recipes.models import Follow, RecipeEvent
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .renderers import FastJSONRenderer
+
+EVENT_VALUES = ('id', 'recipe_id', 'recipe__name', 'author_id')
+RENDERER = FastJSONRenderer()
+
+logger = logging.getLogger(__name__)
+
+
+def database_sync_to_async(func):
+    """sync_to_async с закрытием устаревших соединений с базой."""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+@database_sync_to_async
+def authenticate(key):
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+@database_sync_to_async
+def get_missed_events(user_id, last_event_id):
+    return list(RecipeEvent.objects.filter(
+        id__gt=last_event_id,
+        author__authors__user_id=user_id,
+    ).order_by('id').values(*EVENT_VALUES)[:settings.EVENTS_REPLAY_LIMIT])
+
+
+@database_sync_to_async
+def get_new_events(last_event_id, since, seen_ids):
+    """События после last_event_id и не виденные ранее - с since."""
+    return list(RecipeEvent.objects.filter(
+        Q(id__gt=last_event_id) | Q(created__gte=since)
+    ).exclude(id__in=seen_ids).order_by('id').values(
+        *EVENT_VALUES, 'created'
+    )[:settings.EVENTS_REPLAY_LIMIT])
+
+
+@database_sync_to_async
+def get_last_event_id():
+    return RecipeEvent.objects.order_by('-id').values_list(
+        'id', flat=True
+    ).first() or 0
+
+
+@database_sync_to_async
+def get_followers(author_id, user_ids):
+    return set(Follow.objects.filter(
+        author_id=author_id, user_id__in=user_ids
+    ).values_list('user_id', flat=True))
+
+
+def format_event(event):
+    data = RENDERER.render({
+        'id': event['recipe_id'],
+        'name': event['recipe__name'],
+        'author': event['author_id'],
+    })
+    return b'id: %d\nevent: recipe\ndata: %s\n\n' % (event['id'], data)
+
+
+class Subscription:
+    """Очередь событий одного соединения."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: соединение закроется,
+            # а пропущенное он дочитает по Last-Event-ID.
+            self.overflowed = True
+
+
+class Hub:
+    """Подписки соединений этого процесса на события."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.loop = None
+        self.listener = None
+
+    def subscribe(self, user_id):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.listener = self.loop.create_task(get_backend().listen(self))
+        subscription = Subscription()
+        self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        subscriptions = self.subscriptions.get(user_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscriptions.pop(user_id, None)
+
+    async def dispatch(self, event):
+        if not self.subscriptions:
+            return
+        for user_id in await get_followers(
+            event['author_id'], list(self.subscriptions)
+        ):
+            for subscription in self.subscriptions.get(user_id, ()):
+                subscription.put(event)
+
+
+hub = Hub()
+
+
+class DatabaseBackend:
+    """Опрос таблицы RecipeEvent; события видят все процессы."""
+
+    def publish(self, event_id):
+        pass
+
+    async def listen(self, hub):
+        last_event_id = None
+        started = timezone.now()
+        # id -> время разосланных событий из окна EVENTS_COMMIT_LAG.
+        seen = {}
+        while True:
+            try:
+                if last_event_id is None:
+                    last_event_id = await get_last_event_id()
+                    continue
+                since = max(started, timezone.now() - timedelta(
+                    seconds=settings.EVENTS_COMMIT_LAG
+                ))
+                seen = {
+                    event_id: created for event_id, created in seen.items()
+                    if created >= since
+                }
+                events = await get_new_events(
+                    last_event_id, since, list(seen)
+                )
+                for event in events:
+                    seen[event['id']] = event['created']
+                    last_event_id = max(last_event_id, event['id'])
+                    await hub.dispatch(event)
+            except Exception:
+                # Опрос не должен останавливаться, иначе процесс
+                # перестанет рассылать события до перезапуска.
+                logger.exception('Не удалось разослать новые события.')
+            finally:
+                await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+
+
+class LocalBackend:
+    """События только внутри процесса, где создан рецепт."""
+
+    def publish(self, event_id):
+        if hub.loop is None:
+            return
+        event = RecipeEvent.objects.filter(id=event_id).values(
+            *EVENT_VALUES
+        ).first()
+        if event is not None:
+            # Пустой контекст: иначе задача унаследует контекст потока
+            # sync_to_async и не сможет сама обращаться к базе.
+            hub.loop.call_soon_threadsafe(
+                hub.loop.create_task, hub.dispatch(event),
+                context=contextvars.Context()
+            )
+
+    async def listen(self, hub):
+        pass
+
+
+def clean_events(max_age):
+    """Удаляет события старше max_age секунд."""
+    return RecipeEvent.objects.filter(
+        created__lt=timezone.now() - timedelta(seconds=max_age)
+    ).delete()[0]
+
+
+def get_backend():
+    return import_string(settings.EVENTS_BACKEND)()
+
+
+def parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def send_json(send, status, data):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': RENDERER.render(data)})
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def send_event(send, event):
+    await send_body(send, format_event(event))
+
+
+async def events_application(scope, receive, send):
+    """ASGI-приложение потока событий текущего пользователя."""
+    if scope['method'] != 'GET':
+        return await send_json(send, 405, {'detail': 'Метод не разрешен.'})
+
+    headers = dict(scope['headers'])
+    keyword, _, key = headers.get(
+        b'authorization', b''
+    ).decode('latin-1').partition(' ')
+    user = None
+    if keyword.lower() == 'token' and key:
+        user = await authenticate(key.strip())
+    if user is None:
+        return await send_json(
+            send, 401, {'detail': 'Учетные данные не были предоставлены.'}
+        )
+
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    last_event_id = parse_event_id(
+        headers.get(b'last-event-id')
+        or query.get('last_event_id', [None])[0]
+    )
+
+    subscription = hub.subscribe(user.pk)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        # События из очереди могли уже прийти с пропущенными.
+        replayed = set()
+        if last_event_id is not None:
+            for event in await get_missed_events(user.pk, last_event_id):
+                await send_event(send, event)
+                replayed.add(event['id'])
+
+        while not disconnect.done() and not subscription.overflowed:
+            get = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                (get, disconnect),
+                timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if get not in done:
+                get.cancel()
+                if not disconnect.done():
+                    await send_body(send, b': ping\n\n')
+                continue
+            event = get.result()
+            if event['id'] not in replayed:
+                await send_event(send, event)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnect.cancel()
+        hub.unsubscribe(user.pk, subscription)
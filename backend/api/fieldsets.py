@@ -0,0 +1,45 @@
+"""
+Выбор полей ответа параметрами запроса.
+
+?fields=id,name - оставить только перечисленные поля,
+?omit=text - убрать перечисленные поля,
+?expand=author - раскрыть только перечисленные вложенные объекты;
+остальные вложенные объекты заменяются на id. Без expand раскрыты все.
+
+Вьюсеты по тому же выбору убирают из запроса ненужные JOIN,
+prefetch_related и аннотации.
+"""
+
+
+def parse_names(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class FieldSelection:
+    """Набор полей, запрошенный клиентом."""
+
+    def __init__(self, query_params=None):
+        query_params = query_params or {}
+        self.only = parse_names(query_params.get('fields'))
+        self.omit = parse_names(query_params.get('omit')) or set()
+        self.expand = parse_names(query_params.get('expand'))
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(getattr(request, 'query_params', None))
+
+    def includes(self, field):
+        return (
+            (self.only is None or field in self.only)
+            and field not in self.omit
+        )
+
+    def expands(self, field):
+        return self.includes(field) and (
+            self.expand is None or field in self.expand
+        )
+
+    def filter(self, fields):
+        return tuple(field for field in fields if self.includes(field))
@@ -1,15 +1,32 @@
 import django_filters
+from django.db.models import F
 from django_filters.rest_framework import FilterSet
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_ingredients
 
 
 class IngredientFilter(FilterSet):
-    name = django_filters.filters.CharFilter(lookup_expr='istartswith')
+    name = django_filters.filters.CharFilter(method='filter_name')
+    fuzzy = django_filters.NumberFilter(method='filter_fuzzy')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_name(self, queryset, name, value):
+        """Поиск по началу названия; fuzzy=1 - с опечатками."""
+        if self.form.cleaned_data.get('fuzzy'):
+            return search_ingredients(queryset, value)
+        return queryset.filter(name__istartswith=value)
+
+    def filter_fuzzy(self, queryset, name, value):
+        return queryset
+
+
+class OrderingFilter(django_filters.BaseCSVFilter,
+                     django_filters.ChoiceFilter):
+    """Несколько ключей сортировки через запятую из списка choices."""
+
 
 class RecipeFilter(FilterSet):
     tags = django_filters.ModelMultipleChoiceFilter(
@@ -21,6 +38,37 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    cooking_time_min = django_filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte'
+    )
+    cooking_time_max = django_filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
+    ordering = OrderingFilter(
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'В тренде'),
+            ('cooking_time', 'Время приготовления'),
+            ('-cooking_time', 'Время приготовления, по убыванию'),
+            ('name', 'Название'),
+            ('-name', 'Название, по убыванию'),
+            ('pub_date', 'Дата публикации'),
+            ('-pub_date', 'Дата публикации, по убыванию'),
+        ),
+        method='filter_ordering'
+    )
+
+    ORDERINGS = {
+        'popular': (F('score__popular').desc(), F('score__recipe').desc()),
+        'trending': (F('score__trending').desc(), F('score__recipe').desc()),
+        'cooking_time': (F('cooking_time').asc(),),
+        '-cooking_time': (F('cooking_time').desc(),),
+        'name': (F('name').asc(),),
+        '-name': (F('name').desc(),),
+        'pub_date': (F('pub_date').asc(),),
+        '-pub_date': (F('pub_date').desc(),),
+    }
+    SCORE_ORDERINGS = {'popular', 'trending'}
 
     class Meta:
         model = Recipe
@@ -37,3 +85,20 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shoppingcarts__user=user)
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        keys = list(dict.fromkeys(value))
+        ordering = [
+            expression for key in keys for expression in self.ORDERINGS[key]
+        ]
+        if self.SCORE_ORDERINGS.intersection(keys):
+            # Рейтинг есть у каждого рецепта, поэтому фильтр по score
+            # превращает соединение во внутреннее и позволяет читать
+            # страницу прямо по индексу рейтинга.
+            return queryset.filter(score__isnull=False).order_by(*ordering)
+        # id в направлении последнего ключа: порядок однозначен
+        # и совпадает с индексами (поле, id).
+        ordering.append(
+            F('id').desc() if keys[-1].startswith('-') else F('id').asc()
+        )
+        return queryset.order_by(*ordering)
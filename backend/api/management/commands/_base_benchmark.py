@@ -0,0 +1,50 @@
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class BaseBenchmarkCommand(BaseCommand):
+    """Базовая команда для микробенчмарков на реальных данных API."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Количество рецептов на странице.'
+        )
+        parser.add_argument(
+            '--number', type=int, default=50,
+            help='Количество прогонов в одном замере.'
+        )
+
+    def get_request(self, path='/api/recipes/'):
+        hosts = [
+            host for host in settings.ALLOWED_HOSTS
+            if host and not host.startswith(('*', '.'))
+        ]
+        return Request(APIRequestFactory().get(
+            path, HTTP_HOST=hosts[0] if hosts else 'localhost'
+        ))
+
+    def get_recipes(self, limit):
+        return list(
+            Recipe.objects.select_related('author').prefetch_related(
+                'tags', 'recipe_ingredients__ingredient'
+            )[:limit]
+        )
+
+    def measure(self, func, number):
+        """Лучшее время одного вызова в миллисекундах."""
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        return best / number * 1000
+
+    def report(self, title, results):
+        self.stdout.write(title)
+        baseline = results[0][1]
+        for name, elapsed in results:
+            self.stdout.write(
+                f'  {name:<24} {elapsed:8.3f} мс  x{baseline / elapsed:.2f}'
+            )
@@ -0,0 +1,135 @@
+import re
+from types import SimpleNamespace
+
+from api.filters import IngredientFilter, RecipeFilter
+from api.views import RecipeViewSet
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from recipes.models import Ingredient, Recipe, Tag, User
+
+POSTGRES_PROBLEMS = (
+    (re.compile(r'Seq Scan on (\w+)'), 'последовательное чтение {0}'),
+    (re.compile(r'Sort Method: external'), 'сортировка ушла на диск'),
+)
+SQLITE_PROBLEMS = (
+    (
+        re.compile(r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)'),
+        'полный проход по {0}'
+    ),
+    (
+        re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)'),
+        'сортировка без индекса'
+    ),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Планы выполнения горячих запросов API: поиск последовательных '
+        'чтений и сортировок без индекса'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-analyze', action='store_true',
+            help='Не выполнять запросы (EXPLAIN без ANALYZE) в PostgreSQL.'
+        )
+
+    def get_hot_querysets(self):
+        """Запросы, которые выполняются на каждом популярном эндпоинте."""
+        user = User.objects.annotate(
+            cart_size=Count('shoppingcarts')
+        ).order_by('-cart_size').first() or User(pk=0)
+        author = Recipe.objects.values_list('author', flat=True).first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        recipes = RecipeViewSet.queryset.prefetch_related(None)
+
+        return (
+            (
+                'Лента рецептов',
+                recipes.values_list('pk', flat=True)[:6],
+                'Recipe(-pub_date, id)',
+            ),
+            (
+                'Фильтр: автор + теги + избранное + корзина',
+                RecipeFilter(
+                    {
+                        'author': author, 'tags': tags,
+                        'is_favorited': 1, 'is_in_shopping_cart': 1,
+                    },
+                    queryset=recipes,
+                    request=SimpleNamespace(user=user),
+                ).qs[:6],
+                'Recipe(author, -pub_date)',
+            ),
+            (
+                'Список покупок (download_shopping_cart)',
+                Ingredient.objects.filter(
+                    recipe_ingredients__recipe__shoppingcarts__user=user
+                ).values('name', 'measurement_unit').annotate(
+                    amount=Sum('recipe_ingredients__amount')
+                ).order_by('name'),
+                'ShoppingCart(user, recipe), RecipeIngredient(recipe)',
+            ),
+            (
+                'Подписки (subscriptions)',
+                User.objects.filter(authors__user=user)[:6],
+                'Follow(user, author)',
+            ),
+            (
+                'Рецепты авторов в подписках',
+                Recipe.objects.filter(author__authors__user=user),
+                'Recipe(author, -pub_date)',
+            ),
+            (
+                'Поиск ингредиентов',
+                IngredientFilter(
+                    {'name': 'мол'}, queryset=Ingredient.objects.all()
+                ).qs,
+                'Ingredient(name)',
+            ),
+        )
+
+    def explain(self, queryset, analyze):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=analyze, buffers=analyze)
+        return queryset.explain()
+
+    def find_problems(self, plan):
+        problems = (
+            POSTGRES_PROBLEMS if connection.vendor == 'postgresql'
+            else SQLITE_PROBLEMS
+        )
+        return [
+            message.format(*match.groups())
+            for line in plan.splitlines()
+            for pattern, message in problems
+            for match in [pattern.search(line)] if match
+        ]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'База данных: {connection.vendor}')
+        found = 0
+        for title, queryset, index in self.get_hot_querysets():
+            plan = self.explain(queryset, not options['no_analyze'])
+            problems = self.find_problems(plan)
+            found += bool(problems)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(plan)
+            if problems:
+                self.stdout.write(self.style.WARNING(
+                    'Проблемы: ' + '; '.join(problems)
+                ))
+                self.stdout.write(f'Нужен индекс: {index}')
+            else:
+                self.stdout.write(self.style.SUCCESS('Индексы используются.'))
+            self.stdout.write('')
+
+        self.stdout.write(
+            f'Запросов с проблемами: {found}. На маленьких таблицах '
+            f'планировщик может выбрать полный проход даже при наличии '
+            f'индекса - проверяйте на данных, близких к боевым.'
+        )
@@ -0,0 +1,44 @@
+import time
+
+from api.compression import COMPRESSORS
+from api.renderers import FastJSONRenderer
+from api.serializers import (IngredientSerializer, RecipeReadSerializer,
+                             TagSerializer)
+from recipes.models import Ingredient, Tag
+
+from ._base_benchmark import BaseBenchmarkCommand
+
+
+class Command(BaseBenchmarkCommand):
+    help = 'Размер и стоимость сжатия типичных ответов API'
+
+    def get_payloads(self, limit):
+        request = self.get_request()
+        renderer = FastJSONRenderer()
+        return (
+            ('tags', renderer.render(
+                TagSerializer(Tag.objects.all(), many=True).data
+            )),
+            ('ingredients', renderer.render(
+                IngredientSerializer(Ingredient.objects.all(), many=True).data
+            )),
+            ('recipes', renderer.render(RecipeReadSerializer(
+                self.get_recipes(limit), many=True,
+                context={'request': request}
+            ).data)),
+        )
+
+    def handle(self, *args, **options):
+        number = options['number']
+        for name, content in self.get_payloads(options['limit']):
+            self.stdout.write(f'{name}: {len(content)} байт')
+            for coding, compress in COMPRESSORS.items():
+                start = time.process_time()
+                for _ in range(number):
+                    compressed = compress(content)
+                elapsed = (time.process_time() - start) / number * 1000
+                saved = 1 - len(compressed) / len(content) if content else 0
+                self.stdout.write(
+                    f'  {coding:<8} {len(compressed):>10} байт  '
+                    f'-{saved:6.1%}  {elapsed:8.3f} мс CPU'
+                )
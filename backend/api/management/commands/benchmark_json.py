@@ -0,0 +1,50 @@
+from io import BytesIO
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import RecipeReadSerializer
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from ._base_benchmark import BaseBenchmarkCommand
+
+
+class Command(BaseBenchmarkCommand):
+    help = 'Сравнение JSON-рендереров и парсеров на выдаче рецептов'
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен: FastJSONRenderer работает через json.'
+            ))
+
+        data = RecipeReadSerializer(
+            self.get_recipes(options['limit']),
+            many=True,
+            context={'request': self.get_request()}
+        ).data
+        number = options['number']
+
+        renderers = (JSONRenderer(), FastJSONRenderer())
+        rendered = [renderer.render(data) for renderer in renderers]
+        if rendered[0] != rendered[1]:
+            self.stdout.write(self.style.ERROR(
+                'Вывод FastJSONRenderer отличается от JSONRenderer!'
+            ))
+
+        self.stdout.write(
+            f'Рецептов: {len(data)}, размер ответа: {len(rendered[0])} байт'
+        )
+        self.report('Рендеринг:', [
+            (type(renderer).__name__, self.measure(
+                lambda renderer=renderer: renderer.render(data), number
+            ))
+            for renderer in renderers
+        ])
+        self.report('Парсинг:', [
+            (type(parser).__name__, self.measure(
+                lambda parser=parser: parser.parse(BytesIO(rendered[0])),
+                number
+            ))
+            for parser in (JSONParser(), FastJSONParser())
+        ])
@@ -0,0 +1,57 @@
+from api.compiled import CompiledRecipeSerializer
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer
+from django.core.management.base import CommandError
+from recipes.models import User
+
+from ._base_benchmark import BaseBenchmarkCommand
+
+
+class Command(BaseBenchmarkCommand):
+    help = (
+        'Сравнение RecipeReadSerializer и скомпилированной сериализации: '
+        'проверка идентичности вывода и замер скорости'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого запрос.'
+        )
+
+    def handle(self, *args, **options):
+        request = self.get_request()
+        if options['user']:
+            request.user = User.objects.get(email=options['user'])
+
+        limit = options['limit']
+        recipe_ids = [recipe.pk for recipe in self.get_recipes(limit)]
+
+        def serialize_drf():
+            return RecipeReadSerializer(
+                self.get_recipes(limit),
+                many=True,
+                context={'request': request}
+            ).data
+
+        def serialize_compiled():
+            return CompiledRecipeSerializer(request).serialize(recipe_ids)
+
+        renderer = FastJSONRenderer()
+        if renderer.render(serialize_drf()) != renderer.render(
+            serialize_compiled()
+        ):
+            raise CommandError(
+                'Вывод CompiledRecipeSerializer отличается '
+                'от RecipeReadSerializer.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Вывод для {len(recipe_ids)} рецептов совпадает байт в байт.'
+        ))
+
+        number = options['number']
+        self.report('Сериализация списка (с запросами к БД):', [
+            ('RecipeReadSerializer', self.measure(serialize_drf, number)),
+            ('CompiledRecipeSerializer',
+             self.measure(serialize_compiled, number)),
+        ])
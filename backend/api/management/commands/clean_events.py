@@ -0,0 +1,17 @@
+from api.events import clean_events
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Удаление устаревших событий о новых рецептах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=settings.EVENTS_MAX_AGE,
+            help='Возраст событий в секундах, после которого они удаляются.'
+        )
+
+    def handle(self, *args, **options):
+        deleted = clean_events(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено событий: {deleted}'))
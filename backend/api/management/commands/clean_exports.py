@@ -0,0 +1,17 @@
+from api.delivery import clean_exports
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Удаление устаревших сгенерированных файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=settings.EXPORTS_MAX_AGE,
+            help='Возраст файлов в секундах, после которого они удаляются.'
+        )
+
+    def handle(self, *args, **options):
+        removed = clean_exports(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
@@ -0,0 +1,70 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Под gunicorn каждый воркер пишет значения в свои файлы в каталоге
+PROMETHEUS_MULTIPROC_DIR, а /metrics собирает их вместе, поэтому
+ответ не зависит от того, какой воркер принял запрос. Без этой
+переменной окружения метрики хранятся в памяти процесса.
+
+Запросы размечаются именем маршрута: для вьюсетов DRF это
+<basename>-<действие>, например recipes-list.
+"""
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+REQUESTS = Counter(
+    'foodgram_requests_total',
+    'Запросы по маршрутам',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    ('view',),
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries',
+    'Число запросов к базе за один запрос к API',
+    ('view',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+DB_DURATION = Histogram(
+    'foodgram_db_duration_seconds',
+    'Суммарное время запросов к базе за один запрос к API',
+    ('view',),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кешу по видам фрагментов',
+    ('cache', 'result'),
+)
+UPLOAD_SIZE = Histogram(
+    'foodgram_image_upload_bytes',
+    'Размер загруженных картинок',
+    ('field',),
+    buckets=tuple(size * 1024 for size in (
+        16, 64, 256, 512, 1024, 2 * 1024, 5 * 1024, 10 * 1024, 20 * 1024
+    )),
+)
+
+
+def count_cache(cache, hits, misses):
+    if hits:
+        CACHE_REQUESTS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, 'miss').inc(misses)
+
+
+def metrics_view(request):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
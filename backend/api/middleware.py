@@ -0,0 +1,250 @@
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+
+from . import cache, metrics
+from .compression import IDENTITY, choose_encoding, compress_variants
+from .filters import RecipeFilter
+from .models import MAX_LENGTH_PATH, RequestProfile
+from .profiling import Profiler
+
+# Заголовки, которые ответ из кеша выставляет сам.
+REBUILT_HEADERS = {'content-type', 'content-length', 'content-encoding'}
+
+
+class PrecompressedResponseMiddleware:
+    """
+    Кеш публичных JSON-ответов вместе со сжатыми вариантами.
+
+    Ответ на анонимный GET к путям из PRECOMPRESSED_PATHS сжимается
+    в gzip/brotli один раз и сохраняется в кеше рядом с исходным телом;
+    дальше клиенту отдаётся подходящий по Accept-Encoding вариант.
+    Маленькие ответы не сжимаются. Сортировки по рейтингу не кешируются:
+    рейтинги меняются без смены версии ответов. Ответ из кеша отдаётся
+    только после проверки лимитов запросов вьюхи. Версия ответа берётся
+    по семейству пути: справочники не сбрасываются при смене рецептов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = [
+            (re.compile(path), family)
+            for path, family in settings.PRECOMPRESSED_PATHS
+        ]
+
+    def get_family(self, request):
+        """Семейство кешируемого ответа или None."""
+        if (
+            request.method != 'GET'
+            or 'HTTP_AUTHORIZATION' in request.META
+            or self.has_score_ordering(request)
+        ):
+            return None
+        for path, family in self.paths:
+            if path.match(request.path_info):
+                return family
+        return None
+
+    def has_score_ordering(self, request):
+        keys = {
+            key.strip().lstrip('-')
+            for value in request.GET.getlist('ordering')
+            for key in value.split(',')
+        }
+        return not RecipeFilter.SCORE_ORDERINGS.isdisjoint(keys)
+
+    def get_cache_key(self, request, family):
+        digest = hashlib.md5(
+            f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT")}'
+            .encode()
+        ).hexdigest()
+        return cache.RESPONSE_KEY.format(
+            version=cache.get_responses_version(family), digest=digest
+        )
+
+    def check_throttles(self, request):
+        """Ответ 429, если лимит вьюхи исчерпан, иначе None."""
+        match = resolve(request.path_info)
+        actions = getattr(match.func, 'actions', None)
+        if actions is None:
+            return None
+        view = match.func.cls(**match.func.initkwargs)
+        view.action_map = actions
+        view.args, view.kwargs = match.args, match.kwargs
+        view.headers = view.default_response_headers
+        drf_request = view.initialize_request(
+            request, *match.args, **match.kwargs
+        )
+        try:
+            view.check_throttles(drf_request)
+        except Throttled as exc:
+            response = view.finalize_response(
+                drf_request, view.handle_exception(exc)
+            )
+            return response.render()
+        return None
+
+    def __call__(self, request):
+        family = self.get_family(request)
+        if family is None:
+            return self.get_response(request)
+
+        key = self.get_cache_key(request, family)
+        cached = django_cache.get(key)
+        metrics.count_cache('response', cached is not None, cached is None)
+        if cached is not None:
+            throttled = self.check_throttles(request)
+            if throttled is not None:
+                return throttled
+        else:
+            response = self.get_response(request)
+            if (
+                response.status_code != 200
+                or response.streaming
+                or not response.get('Content-Type', '').startswith(
+                    'application/json'
+                )
+            ):
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+            cached = {
+                'content_type': response['Content-Type'],
+                'headers': [
+                    (header, value) for header, value in response.items()
+                    if header.lower() not in REBUILT_HEADERS
+                ],
+                'variants': compress_variants(response.content),
+            }
+            django_cache.set(key, cached, settings.API_CACHE_TIMEOUT)
+
+        coding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING'), cached['variants']
+        )
+        response = HttpResponse(
+            cached['variants'][coding], content_type=cached['content_type']
+        )
+        for header, value in cached['headers']:
+            response[header] = value
+        if coding != IDENTITY:
+            response['Content-Encoding'] = coding
+        response['Content-Length'] = len(response.content)
+        patch_vary_headers(
+            response, ('Accept', 'Authorization', 'Accept-Encoding')
+        )
+        return response
+
+
+class QueryStats:
+    """Число и суммарное время запросов к базе."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unresolved'
+    return match.url_name or match.view_name
+
+
+class MetricsMiddleware:
+    """Счётчики и время запросов по маршрутам, нагрузка на базу."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = get_view_name(request)
+        metrics.REQUESTS.labels(
+            view, request.method, response.status_code
+        ).inc()
+        metrics.REQUEST_DURATION.labels(view).observe(duration)
+        metrics.DB_QUERIES.labels(view).observe(stats.count)
+        metrics.DB_DURATION.labels(view).observe(stats.duration)
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Профилирование запроса по заголовку X-Profile или параметру ?_profile.
+
+    Работает только для администраторов. Профиль сохраняется
+    в PROFILES_ROOT, его id возвращается в заголовке X-Profile-Id,
+    а список последних профилей есть в админке. Запросы без флага
+    проходят без профайлера.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_requested(self, request):
+        return 'HTTP_X_PROFILE' in request.META or '_profile' in request.GET
+
+    def get_staff_user(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            # Токен API проверяет только DRF, уже внутри вьюхи.
+            try:
+                result = TokenAuthentication().authenticate(request)
+            except AuthenticationFailed:
+                return None
+            if result is None:
+                return None
+            user = result[0]
+        return user if user.is_staff else None
+
+    def __call__(self, request):
+        if not self.is_requested(request):
+            return self.get_response(request)
+        user = self.get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        profiler = Profiler()
+        with profiler:
+            response = self.get_response(request)
+        name = f'{request.method} {request.get_full_path()}'
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:MAX_LENGTH_PATH],
+            view=get_view_name(request),
+            status_code=response.status_code,
+            duration=profiler.duration,
+            query_count=len(profiler.queries),
+            query_time=profiler.query_time,
+            filename=profiler.save(name),
+        )
+        RequestProfile.objects.filter(pk__in=RequestProfile.objects.values(
+            'pk'
+        )[settings.PROFILES_KEEP:]).delete()
+        response['X-Profile-Id'] = profile.pk
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2000, verbose_name='Путь')),
+                ('view', models.CharField(max_length=200, verbose_name='Маршрут')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration', models.FloatField(verbose_name='Время, с')),
+                ('query_count', models.PositiveIntegerField(verbose_name='Запросов к базе')),
+                ('query_time', models.FloatField(verbose_name='Время в базе, с')),
+                ('filename', models.CharField(max_length=100, verbose_name='Файл')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Снят')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import models
+
+MAX_LENGTH_PATH = 2000
+MAX_LENGTH_VIEW_NAME = 200
+MAX_LENGTH_FILENAME = 100
+
+
+class RequestProfile(models.Model):
+    """Профиль одного запроса, снятый по запросу администратора."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='request_profiles',
+        verbose_name='Пользователь',
+    )
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Путь', max_length=MAX_LENGTH_PATH)
+    view = models.CharField('Маршрут', max_length=MAX_LENGTH_VIEW_NAME)
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    duration = models.FloatField('Время, с')
+    query_count = models.PositiveIntegerField('Запросов к базе')
+    query_time = models.FloatField('Время в базе, с')
+    filename = models.CharField('Файл', max_length=MAX_LENGTH_FILENAME)
+    created = models.DateTimeField('Снят', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
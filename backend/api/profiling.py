@@ -0,0 +1,163 @@
+"""
+Профилирование одного запроса по требованию.
+
+Пока выполняется запрос, отдельный поток раз в PROFILE_INTERVAL_MS
+миллисекунд снимает стек потока запроса (sys._current_frames). Если
+в этот момент идёт запрос к базе, поверх стека добавляется кадр с его
+SQL, так что на флейм-графе видно, какие запросы сколько заняли.
+Кроме того, все запросы к базе записываются отдельным профилем-
+хронологией.
+
+Результат сохраняется в PROFILES_ROOT в формате speedscope
+(https://www.speedscope.app), его можно открыть там же.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+SQL_FRAME_LENGTH = 120
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+class Frames:
+    """Таблица кадров speedscope: кадр -> номер."""
+
+    def __init__(self):
+        self.index = {}
+        self.frames = []
+
+    def get(self, name, file=None, line=None):
+        key = (name, file, line)
+        if key not in self.index:
+            self.index[key] = len(self.frames)
+            frame = {'name': name}
+            if file:
+                frame['file'] = file
+                frame['line'] = line
+            self.frames.append(frame)
+        return self.index[key]
+
+
+class Profiler:
+    """Сэмплирующий профайлер потока с трассировкой SQL."""
+
+    def __init__(self, interval=None):
+        self.interval = (
+            interval or settings.PROFILE_INTERVAL_MS
+        ) / 1000
+        self.thread_id = threading.get_ident()
+        self.frames = Frames()
+        self.samples = []
+        self.weights = []
+        self.queries = []
+        self.current_sql = None
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.last_sample = self.start
+        self.wrapper = connection.execute_wrapper(self.trace_sql)
+        self.wrapper.__enter__()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.sampler.join()
+        self.wrapper.__exit__(*exc_info)
+        self.duration = time.perf_counter() - self.start
+
+    def trace_sql(self, execute, sql, params, many, context):
+        self.current_sql = sql
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.current_sql = None
+            self.queries.append({
+                'sql': sql,
+                'start': start - self.start,
+                'duration': time.perf_counter() - start,
+            })
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(self.frames.get(
+                    code.co_name, code.co_filename, code.co_firstlineno
+                ))
+                frame = frame.f_back
+            stack.reverse()
+            sql = self.current_sql
+            if sql is not None:
+                stack.append(self.frames.get(sql[:SQL_FRAME_LENGTH]))
+            self.samples.append(stack)
+            self.weights.append(now - self.last_sample)
+            self.last_sample = now
+
+    @property
+    def query_time(self):
+        return sum(query['duration'] for query in self.queries)
+
+    def get_sql_events(self):
+        events = []
+        for query in self.queries:
+            frame = self.frames.get(query['sql'][:SQL_FRAME_LENGTH])
+            events.append({'type': 'O', 'frame': frame, 'at': query['start']})
+            events.append({
+                'type': 'C',
+                'frame': frame,
+                'at': query['start'] + query['duration'],
+            })
+        return events
+
+    def to_speedscope(self, name):
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': name,
+            'exporter': 'foodgram',
+            'activeProfileIndex': 0,
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': f'{name}: Python',
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': self.duration,
+                    'samples': self.samples,
+                    'weights': self.weights,
+                },
+                {
+                    'type': 'evented',
+                    'name': f'{name}: SQL ({len(self.queries)})',
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': self.duration,
+                    'events': self.get_sql_events(),
+                },
+            ],
+            'shared': {'frames': self.frames.frames},
+        }
+
+    def save(self, name):
+        """Записывает профиль в PROFILES_ROOT и возвращает имя файла."""
+        filename = f'{uuid.uuid4().hex}.speedscope.json'
+        os.makedirs(settings.PROFILES_ROOT, exist_ok=True)
+        with open(
+            os.path.join(settings.PROFILES_ROOT, filename), 'w'
+        ) as file:
+            json.dump(self.to_speedscope(name), file)
+        return filename
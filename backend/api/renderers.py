@@ -0,0 +1,50 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ENCODER = JSONEncoder()
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if orjson else 0
+)
+
+
+def orjson_default(obj):
+    """
+    Типы, которые orjson не сериализует сам (дата и время, Decimal,
+    ленивые строки, QuerySet), кодируем так же, как JSONEncoder из DRF,
+    чтобы ответы не отличались от стандартного рендерера.
+    """
+    return ENCODER.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson.
+
+    Если orjson не установлен или клиент запросил форматирование
+    с отступами, используется стандартный рендерер DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        if data is None:
+            return b''
+
+        return orjson.dumps(
+            data, default=orjson_default, option=ORJSON_OPTIONS
+        ).replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
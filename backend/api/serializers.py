@@ -1,11 +1,16 @@
 from collections import Counter
 
+from django.conf import settings
+from django.core import signing
 from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
+from recipes import fingerprints, tasks
 from recipes.models import (MIN_AMOUNT, MIN_TIME, Favorite, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCart, Tag)
 from rest_framework import serializers
 
+from . import sync
+from .fieldsets import FieldSelection
 from .utils import Base64ImageField
 
 
@@ -43,13 +48,42 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class UserSerializer(DjoserUserSerializer):
+class SparseFieldsetMixin:
+    """
+    Миксин выбора полей по ?fields=, ?omit= и ?expand=.
+    Действует только на сериализатор верхнего уровня; нераскрытые поля
+    из collapsed_fields заменяются на поля с id.
+    """
+    collapsed_fields = {}
+
+    @property
+    def is_root(self):
+        return self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent.parent is None
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or not self.is_root:
+            return fields
+
+        selection = FieldSelection.from_request(request)
+        for name in list(fields):
+            if not selection.includes(name):
+                del fields[name]
+            elif name in self.collapsed_fields and not selection.expands(
+                name
+            ):
+                fields[name] = self.collapsed_fields[name]()
+        return fields
+
+
+class UserSerializer(SparseFieldsetMixin, DjoserUserSerializer):
     """Сериализатор для пользователя."""
     is_subscribed = serializers.SerializerMethodField()
-    shopping_cart_count = serializers.IntegerField(
-        source='shoppingcarts.count',
-        read_only=True
-    )
+    shopping_cart_count = serializers.SerializerMethodField()
     avatar = Base64ImageField(required=False, allow_null=True)
 
     class Meta(DjoserUserSerializer.Meta):
@@ -68,13 +102,19 @@ class UserSerializer(DjoserUserSerializer):
             request
             and request.user.is_authenticated
             and (
-                getattr(user, 'is_subscribed_annotated', False)
-                or user.authors.filter(user=request.user).exists()
+                user.is_subscribed_annotated
+                if hasattr(user, 'is_subscribed_annotated')
+                else user.authors.filter(user=request.user).exists()
             )
         )
 
+    def get_shopping_cart_count(self, user):
+        if hasattr(user, 'shopping_cart_count_annotated'):
+            return user.shopping_cart_count_annotated
+        return user.shoppingcarts.filter(recipe__is_hidden=False).count()
+
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для чтения рецептов."""
 
     author = UserSerializer(read_only=True)
@@ -96,19 +136,29 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
+    collapsed_fields = {
+        'author': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'tags': lambda: serializers.PrimaryKeyRelatedField(
+            many=True, read_only=True
+        ),
+        'ingredients': lambda: serializers.SlugRelatedField(
+            many=True, read_only=True,
+            slug_field='ingredient_id', source='recipe_ingredients'
+        ),
+    }
+
     def _is_exists(self, recipe, model_class):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
 
         attr_name = f'is_in_{model_class._meta.model_name}_annotated'
+        if hasattr(recipe, attr_name):
+            return getattr(recipe, attr_name)
 
-        return (
-            getattr(recipe, attr_name, False)
-            or model_class.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists()
-        )
+        return model_class.objects.filter(
+            user=request.user, recipe=recipe
+        ).exists()
 
     def get_is_favorited(self, recipe):
         return self._is_exists(recipe, Favorite)
@@ -168,6 +218,33 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     def validate_tags(self, tags):
         return self._validate_unique(tags, 'Теги не должны повторяться.')
 
+    def get_fingerprint(self, name, ingredients_data):
+        return fingerprints.compute(name, [
+            ingredient_data['ingredient'].id
+            for ingredient_data in ingredients_data
+        ])
+
+    def validate(self, attrs):
+        """Проверка нового рецепта на почти полную копию существующего."""
+        self.duplicates = []
+        if (
+            self.instance is not None
+            or settings.DUPLICATE_RECIPE_POLICY == 'off'
+        ):
+            return attrs
+        self.duplicates = [
+            recipe_id for recipe_id, _ in fingerprints.find_duplicates(
+                self.get_fingerprint(
+                    attrs['name'], attrs.get('recipe_ingredients', [])
+                )
+            )
+        ]
+        if self.duplicates and settings.DUPLICATE_RECIPE_POLICY == 'reject':
+            raise serializers.ValidationError(
+                f'Такой рецепт уже есть: id={self.duplicates[0]}.'
+            )
+        return attrs
+
     def create_ingredients(self, recipe, ingredients_data):
         RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
@@ -177,6 +254,9 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
             for ingredient_data in ingredients_data
         )
+        tasks.update_signatures.delay(
+            recipe_ids=[recipe.pk], key=f'minhash:{recipe.pk}'
+        )
 
     def to_representation(self, instance):
         return RecipeReadSerializer(instance, context=self.context).data
@@ -188,6 +268,9 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = super().create(validated_data)
         recipe.tags.set(tags_data)
         self.create_ingredients(recipe, ingredients_data)
+        fingerprints.save_fingerprints({
+            recipe.pk: self.get_fingerprint(recipe.name, ingredients_data)
+        })
 
         return recipe
 
@@ -199,8 +282,12 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         instance.tags.set(tags_data)
         instance.recipe_ingredients.all().delete()
         self.create_ingredients(instance, ingredients_data)
+        instance = super().update(instance, validated_data)
+        fingerprints.save_fingerprints({
+            instance.pk: self.get_fingerprint(instance.name, ingredients_data)
+        })
 
-        return super().update(instance, validated_data)
+        return instance
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
@@ -216,15 +303,24 @@ class UserWithRecipesSerializer(UserSerializer):
     """Сериализатор пользователя с рецептами (для подписок)."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True
-    )
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
         fields = (*UserSerializer.Meta.fields, 'recipes', 'recipes_count')
         read_only_fields = fields
 
-    def get_recipes(self, user):
+    collapsed_fields = {
+        'recipes': lambda: serializers.SerializerMethodField(
+            'get_recipe_ids'
+        ),
+    }
+
+    def get_recipes_count(self, user):
+        if hasattr(user, 'recipes_count_annotated'):
+            return user.recipes_count_annotated
+        return user.recipes.count()
+
+    def get_limited_recipes(self, user):
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = user.recipes.all()
@@ -234,9 +330,76 @@ class UserWithRecipesSerializer(UserSerializer):
                 recipes = recipes[:int(limit)]
             except (ValueError, TypeError):
                 pass
+        return recipes
 
+    def get_recipes(self, user):
         return RecipeShortSerializer(
-            recipes,
+            self.get_limited_recipes(user),
             many=True,
             context=self.context
         ).data
+
+    def get_recipe_ids(self, user):
+        return [recipe.pk for recipe in self.get_limited_recipes(user)]
+
+
+class SyncAuthorSerializer(UserSerializer):
+    """Автор в синхронизации: только данные профиля."""
+    is_subscribed = None
+    shopping_cart_count = None
+
+    class Meta(UserSerializer.Meta):
+        fields = (*DjoserUserSerializer.Meta.fields, 'avatar')
+        read_only_fields = fields
+
+
+class SyncRecipeSerializer(RecipeReadSerializer):
+    """
+    Рецепт в синхронизации. Флагов текущего пользователя нет: их
+    изменения не попадают в поток изменений.
+    """
+    author = SyncAuthorSerializer(read_only=True)
+    is_favorited = None
+    is_in_shopping_cart = None
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = (
+            'id', 'author', 'name', 'image', 'text',
+            'ingredients', 'tags', 'cooking_time'
+        )
+        read_only_fields = fields
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Параметры запроса синхронизации."""
+    since = serializers.CharField(required=False)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.SYNC_PAGE_SIZE
+    )
+
+    def validate_since(self, value):
+        try:
+            return sync.decode_cursor(value)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise serializers.ValidationError('Некорректный курсор.')
+
+
+class IdsQuerySerializer(serializers.Serializer):
+    """Список id пакетного запроса: ?ids=1,2,3."""
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(pk) for pk in value.split(',') if pk.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                'Ожидается список id через запятую.'
+            )
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise serializers.ValidationError('Список id пуст.')
+        if len(ids) > settings.BATCH_MAX_IDS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.BATCH_MAX_IDS} id за запрос.'
+            )
+        return ids
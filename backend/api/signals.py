@@ -0,0 +1,122 @@
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes import deletion
+from recipes.models import (Favorite, Follow, Ingredient, Recipe, RecipeEvent,
+                            RecipeIngredient, ShoppingCart, Tag, User)
+
+from . import cache, events
+from .compiled import USER_VALUES
+from .models import RequestProfile
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    cache.invalidate_recipes(instance.pk)
+    cache.invalidate_author_stats(instance.author_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    cache.invalidate_recipes(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        cache.invalidate_recipes(instance.pk)
+        cache.invalidate_author_stats(instance.author_id)
+    elif pk_set:
+        cache.invalidate_recipes(*pk_set)
+        cache.invalidate_author_stats(*Recipe.all_objects.filter(
+            pk__in=pk_set
+        ).values_list('author_id', flat=True).distinct())
+    else:
+        cache.invalidate_catalogue()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalogue(sender, **kwargs):
+    cache.invalidate_catalogue()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    # Вход по токену сохраняет только last_login: автор не изменился.
+    if update_fields and not set(update_fields) & set(USER_VALUES):
+        return
+    cache.invalidate_authors(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorites(sender, instance, **kwargs):
+    cache.invalidate_user_ids(instance.user_id, cache.FAVORITES)
+    cache.invalidate_author_stats(*Recipe.all_objects.filter(
+        pk=instance.recipe_id
+    ).values_list('author_id', flat=True))
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_cart(sender, instance, **kwargs):
+    cache.invalidate_user_ids(instance.user_id, cache.SHOPPING_CART)
+    # shopping_cart_count автора виден в ответах только с его рецептами.
+    cache.invalidate_authors(
+        instance.user_id,
+        responses=Recipe.objects.filter(author_id=instance.user_id).exists()
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follows(sender, instance, **kwargs):
+    cache.invalidate_user_ids(instance.user_id, cache.FOLLOWS)
+    cache.invalidate_author_stats(instance.author_id)
+
+
+@receiver(deletion.hidden, sender=User)
+def invalidate_hidden_author(sender, instance, recipe_ids, **kwargs):
+    # Рецепты автора скрыты одним UPDATE, без post_save.
+    cache.invalidate_recipes(*recipe_ids)
+    cache.invalidate_authors(instance.pk)
+    cache.invalidate_catalogue()
+    # Подписки и избранное скрытого пользователя выпадают из статистики
+    # авторов, хотя строки удалятся только при окончательном удалении.
+    followed = Follow.objects.filter(user=instance).values_list(
+        'author_id', flat=True
+    )
+    favorited = Recipe.all_objects.filter(
+        favorites__user=instance
+    ).values_list('author_id', flat=True)
+    cache.invalidate_author_stats(
+        instance.pk, *set(followed).union(favorited)
+    )
+
+
+@receiver(post_save, sender=RecipeEvent)
+def publish_recipe_event(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: events.get_backend().publish(instance.pk)
+        )
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_file(sender, instance, **kwargs):
+    try:
+        os.remove(os.path.join(settings.PROFILES_ROOT, instance.filename))
+    except FileNotFoundError:
+        pass
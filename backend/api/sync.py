@@ -0,0 +1,23 @@
+"""
+Курсор инкрементальной синхронизации.
+
+Клиенту отдаётся подписанная позиция последнего полученного изменения;
+подделать её или сдвинуть назад, в обход проверки возраста, нельзя.
+"""
+from django.core import signing
+from django.utils.dateparse import parse_datetime
+from recipes.sync import Position
+
+SALT = 'api.sync'
+
+
+def encode_cursor(position):
+    return signing.dumps(
+        [position.time.isoformat(), position.rank, position.id], salt=SALT
+    )
+
+
+def decode_cursor(token):
+    """Позиция из курсора; signing.BadSignature, если курсор подделан."""
+    time, rank, pk = signing.loads(token, salt=SALT)
+    return Position(parse_datetime(time), rank, pk)
@@ -0,0 +1,15 @@
+"""Фоновые задачи API: выполняются воркером очереди jobs."""
+from django.conf import settings
+from jobs.queue import task
+
+from . import delivery, events
+
+
+@task(every=settings.EXPORTS_MAX_AGE)
+def clean_exports():
+    delivery.clean_exports(settings.EXPORTS_MAX_AGE)
+
+
+@task(every=settings.EVENTS_CLEAN_INTERVAL)
+def clean_events():
+    events.clean_events(settings.EVENTS_MAX_AGE)
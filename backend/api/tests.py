@@ -0,0 +1,289 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag, Tombstone,
+                            User)
+from recipes.sync import Position, delete_tombstones
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .compiled import CompiledRecipeSerializer, CompiledSyncRecipeSerializer
+from .renderers import FastJSONRenderer
+from .serializers import RecipeReadSerializer, SyncRecipeSerializer
+from .sync import encode_cursor
+
+THREADS = 8
+# Повторное добавление отвечает 200, а удаление - 204, даже если
+# связи уже нет: параллельные запросы не должны давать других кодов.
+ALLOWED_STATUSES = {200, 201, 204}
+
+
+class RelationsFixtureMixin:
+    """Пользователь, автор с рецептом и адреса связей с ними."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password', first_name='Имя', last_name='Фамилия',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10,
+        )
+        self.cases = (
+            (Favorite, {'recipe': self.recipe},
+             f'/api/recipes/{self.recipe.pk}/favorite/'),
+            (ShoppingCart, {'recipe': self.recipe},
+             f'/api/recipes/{self.recipe.pk}/shopping_cart/'),
+            (Follow, {'author': self.author},
+             f'/api/users/{self.author.pk}/subscribe/'),
+        )
+
+
+class RelationsTests(RelationsFixtureMixin, TestCase):
+    """Повторные запросы к избранному, корзине и подпискам."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def connect(self, signal, model):
+        handler = mock.Mock()
+        signal.connect(handler, sender=model)
+        self.addCleanup(signal.disconnect, handler, sender=model)
+        return handler
+
+    def test_repeat_add(self):
+        for model, target, url in self.cases:
+            with self.subTest(model=model.__name__):
+                handler = self.connect(post_save, model)
+                self.assertEqual(self.client.post(url).status_code, 201)
+                self.assertEqual(self.client.post(url).status_code, 200)
+                self.assertEqual(handler.call_count, 1)
+                self.assertEqual(
+                    model.objects.filter(user=self.user, **target).count(), 1
+                )
+
+    def test_repeat_remove(self):
+        for model, target, url in self.cases:
+            with self.subTest(model=model.__name__):
+                model.objects.create(user=self.user, **target)
+                handler = self.connect(post_delete, model)
+                self.assertEqual(self.client.delete(url).status_code, 204)
+                self.assertEqual(self.client.delete(url).status_code, 204)
+                self.assertEqual(handler.call_count, 1)
+                self.assertFalse(
+                    model.objects.filter(user=self.user, **target).exists()
+                )
+
+    def test_self_follow(self):
+        for pk in (self.user.pk, f'0{self.user.pk}'):
+            with self.subTest(pk=pk):
+                response = self.client.post(f'/api/users/{pk}/subscribe/')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+
+
+# Тестовая SQLite в памяти блокирует таблицу при параллельной записи.
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentRelationsTests(RelationsFixtureMixin, TransactionTestCase):
+    """Параллельные запросы к избранному, корзине и подпискам."""
+
+    def fire(self, url, methods):
+        """Отправляет запросы одновременно и возвращает коды ответов."""
+        barrier = threading.Barrier(len(methods))
+
+        def request(method):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                return getattr(client, method)(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(methods)) as executor:
+            return list(executor.map(request, methods))
+
+    def test_parallel_add(self):
+        for model, target, url in self.cases:
+            with self.subTest(model=model.__name__):
+                statuses = self.fire(url, ['post'] * THREADS)
+                self.assertLessEqual(set(statuses), {200, 201})
+                self.assertEqual(statuses.count(201), 1)
+                self.assertEqual(
+                    model.objects.filter(user=self.user, **target).count(), 1
+                )
+
+    def test_parallel_remove(self):
+        for model, target, url in self.cases:
+            with self.subTest(model=model.__name__):
+                model.objects.create(user=self.user, **target)
+                statuses = self.fire(url, ['delete'] * THREADS)
+                self.assertEqual(set(statuses), {204})
+                self.assertFalse(
+                    model.objects.filter(user=self.user, **target).exists()
+                )
+
+    def test_parallel_add_and_remove(self):
+        for model, target, url in self.cases:
+            with self.subTest(model=model.__name__):
+                statuses = self.fire(
+                    url, ['post', 'delete'] * (THREADS // 2)
+                )
+                self.assertLessEqual(set(statuses), ALLOWED_STATUSES)
+                self.assertLessEqual(
+                    model.objects.filter(user=self.user, **target).count(), 1
+                )
+
+
+class CompiledRecipeSerializerTests(TestCase):
+    """Скомпилированная сериализация совпадает с RecipeReadSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password', first_name='Автор', last_name='Рецептов',
+            avatar='users/avatar.png',
+        )
+        tags = [
+            Tag.objects.create(name='Завтрак', slug='breakfast'),
+            Tag.objects.create(name='Ужин', slug='dinner'),
+        ]
+        ingredients = [
+            Ingredient.objects.create(name='Соль', measurement_unit='г'),
+            Ingredient.objects.create(name='Молоко', measurement_unit='мл'),
+        ]
+        for number, author in enumerate((cls.author, cls.author, cls.user)):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image=f'recipes/images/{number}.png', cooking_time=number + 1,
+            )
+            recipe.tags.set(tags[:number + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+                for amount, ingredient in enumerate(ingredients, number + 1)
+            )
+        cls.recipes = list(Recipe.objects.order_by('id'))
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def render_both(self, user, serializer=RecipeReadSerializer,
+                    compiled_serializer=CompiledRecipeSerializer):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        renderer = FastJSONRenderer()
+        drf = renderer.render(serializer(
+            self.recipes, many=True, context={'request': request}
+        ).data)
+        compiled = renderer.render(compiled_serializer(
+            request
+        ).serialize([recipe.pk for recipe in self.recipes]))
+        return drf, compiled
+
+    def test_anonymous(self):
+        drf, compiled = self.render_both(AnonymousUser())
+        self.assertEqual(compiled, drf)
+
+    def test_authenticated(self):
+        drf, compiled = self.render_both(self.user)
+        self.assertEqual(compiled, drf)
+        for flag in (
+            b'"is_favorited":true', b'"is_in_shopping_cart":true',
+            b'"is_subscribed":true',
+        ):
+            self.assertIn(flag, compiled)
+
+    def test_cached_fragments(self):
+        self.render_both(self.user)
+        drf, compiled = self.render_both(self.user)
+        self.assertEqual(compiled, drf)
+
+    def test_sync_without_user_flags(self):
+        drf, compiled = self.render_both(
+            self.user, SyncRecipeSerializer, CompiledSyncRecipeSerializer
+        )
+        self.assertEqual(compiled, drf)
+        for flag in (
+            b'is_favorited', b'is_in_shopping_cart', b'is_subscribed',
+            b'shopping_cart_count',
+        ):
+            self.assertNotIn(flag, compiled)
+
+
+class SyncTests(TestCase):
+    """Устаревание курсора и изменения автора в потоке синхронизации."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password', first_name='Имя', last_name='Фамилия',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10,
+        )
+
+    def get_sync(self, time):
+        return self.client.get('/api/sync/', {
+            'since': encode_cursor(Position(time, 0, 0))
+        })
+
+    def test_old_cursor_is_valid_until_tombstones_pruned(self):
+        old = timezone.now() - timedelta(days=365)
+        self.assertEqual(self.get_sync(old).status_code, 200)
+
+        tombstone = Tombstone.objects.create(
+            kind=Tombstone.TAG, object_id=1,
+            deleted_at=old + timedelta(days=1),
+        )
+        self.assertEqual(delete_tombstones(60), 1)
+        self.assertEqual(self.get_sync(old).status_code, 410)
+        self.assertEqual(
+            self.get_sync(tombstone.deleted_at).status_code, 410
+        )
+        self.assertEqual(
+            self.get_sync(
+                tombstone.deleted_at + timedelta(seconds=1)
+            ).status_code,
+            200
+        )
+
+    def test_profile_change_touches_recipes(self):
+        self.recipe.refresh_from_db()
+        updated_at = self.recipe.updated_at
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=['last_login'])
+        self.author.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.updated_at, updated_at)
+
+        self.author.first_name = 'Новое'
+        self.author.save()
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, updated_at)
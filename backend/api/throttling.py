@@ -0,0 +1,118 @@
+import math
+import threading
+
+from rest_framework.throttling import SimpleRateThrottle
+
+# GCRA за один вызов: время заполнения ведра (TAT) читается, сдвигается
+# и записывается внутри Redis атомарно. Время берётся у сервера Redis,
+# чтобы часы процессов на разных машинах не влияли на лимит.
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local duration = tonumber(ARGV[2])
+local full_at = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+full_at = full_at + interval
+local wait = full_at - duration - now
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call(
+    'SET', KEYS[1], tostring(full_at),
+    'PX', math.ceil((full_at - now) * 1000)
+)
+return '0'
+"""
+LOCK = threading.Lock()
+
+
+def get_redis_client(cache):
+    """Клиент Redis, если кеш - django-redis, иначе None."""
+    get_client = getattr(getattr(cache, 'client', None), 'get_client', None)
+    return get_client(write=True) if get_client else None
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов по алгоритму token bucket.
+
+    Ведро вмещает N токенов и пополняется равномерно за период из
+    частоты 'N/период'. Состояние хранится в кеше одним числом - временем,
+    когда ведро снова будет полным (GCRA). В Redis оно обновляется
+    Lua-скриптом: проверка атомарна и стоит одного обращения к кешу.
+    С другими бэкендами чтение и запись идут под блокировкой процесса,
+    то есть атомарны только внутри него (достаточно для LocMem).
+
+    Область ограничения задаётся словарём throttle_scopes вьюсета
+    (действие -> scope), частоты - в DEFAULT_THROTTLE_RATES.
+    """
+
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+    scope_suffix = ''
+
+    def __init__(self):
+        # Частота зависит от действия и определяется в allow_request.
+        pass
+
+    def get_ident_for_request(self, request):
+        raise NotImplementedError(
+            '.get_ident_for_request() must be overridden'
+        )
+
+    def allow_request(self, request, view):
+        action_scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None)
+        )
+        if action_scope is None:
+            return True
+
+        self.scope = action_scope + self.scope_suffix
+        self.rate = self.THROTTLE_RATES.get(self.scope)
+        ident = self.get_ident_for_request(request)
+        if self.rate is None or ident is None:
+            return True
+
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.cache_format % {'scope': self.scope, 'ident': ident}
+        self.wait_time = self.take_token(self.duration / self.num_requests)
+        return self.wait_time == 0
+
+    def take_token(self, interval):
+        """Берёт токен; возвращает 0 или сколько секунд ждать токена."""
+        client = get_redis_client(self.cache)
+        if client is not None:
+            script = client.register_script(GCRA_SCRIPT)
+            return float(script(
+                keys=[self.cache.make_key(self.key)],
+                args=[interval, self.duration],
+            ))
+
+        with LOCK:
+            now = self.timer()
+            full_at = max(self.cache.get(self.key, now), now) + interval
+            wait = full_at - self.duration - now
+            if wait > 0:
+                return wait
+            self.cache.set(self.key, full_at, math.ceil(full_at - now))
+            return 0
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Ограничение для авторизованного пользователя."""
+
+    def get_ident_for_request(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Ограничение по IP-адресу клиента, в том числе анонимного."""
+
+    scope_suffix = '_ip'
+
+    def get_ident_for_request(self, request):
+        return self.get_ident(request)
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (IngredientViewSet, RecipeViewSet, SyncViewSet, TagViewSet,
+                    UserViewSet, download_export)
 
 app_name = 'api'
 
@@ -10,8 +11,10 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', UserViewSet, basename='users')
+router.register('sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('exports/<str:token>/', download_export, name='exports'),
 ]
@@ -4,6 +4,8 @@ from datetime import datetime
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from . import metrics
+
 
 def generate_shopping_list(user, ingredients, recipes):
     """Генерация текстового файла со списком покупок."""
@@ -52,4 +54,6 @@ class Base64ImageField(serializers.ImageField):
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
 
-        return super().to_internal_value(data)
+        image = super().to_internal_value(data)
+        metrics.UPLOAD_SIZE.labels(self.field_name).observe(image.size)
+        return image
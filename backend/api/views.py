@@ -1,27 +1,61 @@
-from django.db.models import Sum
-from django.forms import ValidationError
-from django.http import FileResponse
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
+from recipes import deletion, minhash, relations, stats, tasks, timeline
 from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCart,
                             Tag, User)
+from recipes.sync import get_changes, get_position, is_stale
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from . import cache, delivery
+from .compiled import CompiledRecipeSerializer, CompiledSyncRecipeSerializer
+from .fieldsets import FieldSelection
 from .filters import IngredientFilter, RecipeFilter
 from .pagination import NewPageNumberPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (IngredientSerializer, RecipeReadSerializer,
-                          RecipeShortSerializer, RecipeWriteSerializer,
-                          TagSerializer, UserSerializer,
+from .serializers import (IdsQuerySerializer, IngredientSerializer,
+                          RecipeReadSerializer, RecipeShortSerializer,
+                          RecipeWriteSerializer, SyncQuerySerializer,
+                          SyncRecipeSerializer, TagSerializer, UserSerializer,
                           UserWithRecipesSerializer)
+from .sync import encode_cursor
 from .utils import generate_shopping_list
 
+SIMILAR_LIMIT = 6
+SIMILAR_MAX_LIMIT = 50
+SHOPPING_LIST_FILENAME = 'shopping_list.txt'
+
+
+def get_batch_ids(request):
+    """id из ?ids=1,2,3 или None, если параметра нет."""
+    if 'ids' not in request.query_params:
+        return None
+    query = IdsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return query.validated_data['ids']
+
+
+def batch_response(ids, found, results):
+    """
+    Ответ пакетного запроса: объекты в порядке ids и id, которых
+    не нашлось.
+    """
+    return Response({
+        'results': results,
+        'missing': [pk for pk in ids if pk not in found],
+    })
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с тегами."""
@@ -37,6 +71,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    throttle_scopes = {'list': 'ingredients'}
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -46,6 +81,40 @@ class UserViewSet(DjoserUserViewSet):
     Добавляем только работу с подписками.
     """
     pagination_class = NewPageNumberPagination
+    throttle_scopes = {'subscribe': 'subscribe'}
+
+    def annotate_users(self, queryset):
+        """Аннотации для полей пользователя, выбранных в запросе."""
+        selection = FieldSelection.from_request(self.request)
+        user = self.request.user
+        if selection.includes('is_subscribed') and user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed_annotated=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))
+            ))
+        if selection.includes('shopping_cart_count'):
+            queryset = queryset.annotate(shopping_cart_count_annotated=Count(
+                'shoppingcarts', distinct=True,
+                filter=Q(shoppingcarts__recipe__is_hidden=False)
+            ))
+        # С агрегатами Django не применяет Meta.ordering.
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(*User._meta.ordering)
+        return queryset
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = self.annotate_users(queryset)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        ids = get_batch_ids(request)
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+        users = self.get_queryset().in_bulk(ids)
+        return batch_response(ids, users, self.get_serializer(
+            [users[pk] for pk in ids if pk in users], many=True
+        ).data)
 
     @action(
         detail=False,
@@ -54,48 +123,72 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         """Список подписок текущего пользователя."""
+        selection = FieldSelection.from_request(request)
+        queryset = self.annotate_users(
+            User.objects.filter(authors__user=request.user)
+        )
+        if selection.includes('recipes'):
+            queryset = queryset.prefetch_related('recipes')
+        if selection.includes('recipes_count'):
+            queryset = queryset.annotate(recipes_count_annotated=Count(
+                'recipes', distinct=True, filter=Q(recipes__is_hidden=False)
+            )).order_by(*User._meta.ordering)
         return self.get_paginated_response(
             UserWithRecipesSerializer(
-                self.paginate_queryset(
-                    User.objects.filter(authors__user=request.user)
-                    .prefetch_related('recipes')
-                ),
+                self.paginate_queryset(queryset),
                 many=True,
                 context={'request': request}
             ).data
         )
 
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def stats(self, request, id=None):
+        """Статистика автора: рецепты, подписчики, избранное, теги."""
+        author = get_object_or_404(User, pk=id)
+        return Response(cache.get_many(
+            cache.AUTHOR_STATS_KEY, [author.pk],
+            lambda pks: {pk: stats.get_author_stats(pk) for pk in pks},
+            version=cache.get_catalogue_version()
+        )[author.pk])
+
     @action(
         detail=True,
         methods=['post', 'delete'],
         permission_classes=[IsAuthenticated, IsAuthenticatedOrReadOnly]
     )
     def subscribe(self, request, id=None):
-        """Подписка/отписка."""
+        """
+        Подписка/отписка. Повторная подписка и отписка от автора,
+        на которого пользователь не подписан, не считаются ошибкой.
+        """
         user = request.user
         if request.method == 'DELETE':
-            get_object_or_404(Follow, user=user, author_id=id).delete()
+            if not relations.remove(
+                Follow, user, 'author', id
+            ) and not relations.target_exists(Follow, 'author', id):
+                raise Http404('Пользователь не найден.')
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        author = get_object_or_404(User, pk=id)
-
-        if user == author:
+        if relations.to_target_pk(Follow, 'author', id) == user.pk:
             raise ValidationError('Нельзя подписаться на самого себя')
 
-        _, created = Follow.objects.get_or_create(user=user, author=author)
-
-        if not created:
-            raise ValidationError(
-                f'Вы уже подписаны на {author.username}'
-            )
+        result, _ = relations.add(Follow, user, 'author', id)
+        if result == relations.NOT_FOUND:
+            raise Http404('Пользователь не найден.')
 
         return Response(
             UserWithRecipesSerializer(
-                author, context={'request': request}
+                User.objects.get(pk=id), context={'request': request}
             ).data,
-            status=status.HTTP_201_CREATED
+            status=(
+                status.HTTP_201_CREATED if result == relations.CREATED
+                else status.HTTP_200_OK
+            )
         )
 
+    def perform_destroy(self, instance):
+        deletion.hide(instance)
+
     @action(
         detail=False,
         methods=['put', 'delete'],
@@ -105,53 +198,163 @@ class UserViewSet(DjoserUserViewSet):
     def avatar(self, request):
         user = request.user
 
+        old_avatar = user.avatar.name if user.avatar else None
+
         if request.method == 'PUT':
             serializer = UserSerializer(user, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            if old_avatar and old_avatar != user.avatar.name:
+                tasks.delete_files.delay(names=[old_avatar])
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        if user.avatar:
-            user.avatar.delete()
+        if old_avatar:
+            user.avatar = None
             user.save()
+            tasks.delete_files.delay(names=[old_avatar])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags', 'ingredients'
-    )
+    queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
     pagination_class = NewPageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'recipe_create',
+        'favorite': 'recipe_lists',
+        'shopping_cart': 'recipe_lists',
+        'download_shopping_cart': 'download_shopping_cart',
+        'download_shopping_cart_link': 'download_shopping_cart',
+    }
 
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'partial_update'):
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.get_serializer_class() is not RecipeReadSerializer:
+            return queryset.select_related('author').prefetch_related(
+                'tags', 'ingredients'
+            )
+
+        selection = FieldSelection.from_request(self.request)
+        if selection.expands('author'):
+            queryset = queryset.select_related('author')
+        if selection.includes('tags'):
+            queryset = queryset.prefetch_related('tags')
+        if selection.expands('ingredients'):
+            queryset = queryset.prefetch_related(
+                'recipe_ingredients__ingredient'
+            )
+        elif selection.includes('ingredients'):
+            queryset = queryset.prefetch_related('recipe_ingredients')
+
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        for field, model in (
+            ('is_favorited', Favorite),
+            ('is_in_shopping_cart', ShoppingCart),
+        ):
+            if selection.includes(field):
+                queryset = queryset.annotate(**{
+                    f'is_in_{model._meta.model_name}_annotated': Exists(
+                        model.objects.filter(user=user, recipe=OuterRef('pk'))
+                    )
+                })
+        return queryset
+
+    def get_recipes_response(self, queryset):
+        """Постраничный ответ со списком рецептов для чтения."""
+        if not settings.COMPILED_READ_SERIALIZERS:
+            return self.get_paginated_response(
+                self.get_serializer(
+                    self.paginate_queryset(queryset), many=True
+                ).data
+            )
+
+        recipe_ids = self.paginate_queryset(
+            queryset.prefetch_related(None).values_list('pk', flat=True)
+        )
+        return self.get_paginated_response(
+            CompiledRecipeSerializer(
+                self.request, FieldSelection.from_request(self.request)
+            ).serialize(recipe_ids)
+        )
+
+    def get_batch_response(self, ids):
+        """Рецепты по списку id одним запросом, с теми же полями."""
+        if settings.COMPILED_READ_SERIALIZERS:
+            found = set(Recipe.objects.filter(pk__in=ids).values_list(
+                'pk', flat=True
+            ))
+            return batch_response(ids, found, CompiledRecipeSerializer(
+                self.request, FieldSelection.from_request(self.request)
+            ).serialize(pk for pk in ids if pk in found))
+
+        recipes = self.get_queryset().in_bulk(ids)
+        return batch_response(ids, recipes, self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        ).data)
+
+    def list(self, request, *args, **kwargs):
+        ids = get_batch_ids(request)
+        if ids is not None:
+            return self.get_batch_response(ids)
+        return self.get_recipes_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Лента рецептов авторов из подписок."""
+        return self.get_recipes_response(
+            timeline.feed_queryset(request.user, self.get_queryset())
+        )
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if self.duplicates:
+            response['X-Duplicate-Of'] = ','.join(map(str, self.duplicates))
+        return response
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        self.duplicates = serializer.duplicates
 
-    def _add_to_list(self, model, user, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        _, created = model.objects.get_or_create(user=user, recipe=recipe)
+    def perform_destroy(self, instance):
+        deletion.hide(instance)
 
-        if not created:
-            model_name = model._meta.verbose_name.capitalize()
-            raise ValidationError(
-                f'Рецепт "{recipe.name}" уже добавлен в {model_name}'
-            )
+    def _add_to_list(self, model, user, pk):
+        result, row = relations.add(
+            model, user, 'recipe', pk, RecipeShortSerializer.Meta.fields
+        )
+        if result == relations.NOT_FOUND:
+            raise Http404('Рецепт не найден.')
 
+        recipe = Recipe(**dict(zip(RecipeShortSerializer.Meta.fields, row)))
         return Response(
             RecipeShortSerializer(recipe).data,
-            status=status.HTTP_201_CREATED
+            status=(
+                status.HTTP_201_CREATED if result == relations.CREATED
+                else status.HTTP_200_OK
+            )
         )
 
     def _delete_from_list(self, model, user, pk):
-        get_object_or_404(model, user=user, recipe_id=pk).delete()
+        if not relations.remove(
+            model, user, 'recipe', pk
+        ) and not relations.target_exists(model, 'recipe', pk):
+            raise Http404('Рецепт не найден.')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -180,10 +383,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated, IsAuthenticatedOrReadOnly]
     )
     def download_shopping_cart(self, request):
-        user = request.user
+        return delivery.export_response(
+            self.get_shopping_list(request.user), SHOPPING_LIST_FILENAME
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='download_shopping_cart/link',
+        permission_classes=[IsAuthenticated]
+    )
+    def download_shopping_cart_link(self, request):
+        """Временная подписанная ссылка на файл со списком покупок."""
+        name = delivery.save_export(
+            self.get_shopping_list(request.user), SHOPPING_LIST_FILENAME
+        )
+        return Response({'url': request.build_absolute_uri(
+            reverse('api:exports', args=[delivery.sign(name)])
+        )})
 
+    def get_shopping_list(self, user):
         ingredients = Ingredient.objects.filter(
-            recipe_ingredients__recipe__shoppingcarts__user=user
+            recipe_ingredients__recipe__shoppingcarts__user=user,
+            recipe_ingredients__recipe__is_hidden=False
         ).values(
             'name', 'measurement_unit'
         ).annotate(
@@ -192,12 +414,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         recipes = Recipe.objects.filter(shoppingcarts__user=user)
 
-        return FileResponse(
-            generate_shopping_list(user, ingredients, recipes),
-            content_type='text/plain',
-            as_attachment=True,
-            filename='shopping_list.txt',
-        )
+        return generate_shopping_list(user, ingredients, recipes)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Рецепты с похожим набором ингредиентов."""
+        get_object_or_404(Recipe, pk=pk)
+        try:
+            limit = min(
+                int(request.query_params.get('limit', SIMILAR_LIMIT)),
+                SIMILAR_MAX_LIMIT
+            )
+        except ValueError:
+            limit = SIMILAR_LIMIT
+
+        recipe_ids = [
+            recipe_id for recipe_id, _ in minhash.find_similar(pk, limit)
+        ]
+        # Скрытый рецепт остаётся в индексе LSH до удаления из базы.
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        return Response(RecipeShortSerializer(
+            [
+                recipes[recipe_id] for recipe_id in recipe_ids
+                if recipe_id in recipes
+            ],
+            many=True,
+            context={'request': request}
+        ).data)
 
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
@@ -210,3 +453,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 reverse('short-link-redirect', args=[pk])
             )},
         )
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Инкрементальная синхронизация тегов, ингредиентов и рецептов.
+    Возвращает изменения после курсора since и курсор next для
+    следующего запроса; без since - все объекты, постранично.
+    Флагов текущего пользователя в рецептах нет.
+    """
+    throttle_scopes = {'list': 'sync'}
+
+    def list(self, request):
+        query = SyncQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        position = query.validated_data.get('since')
+        if position and is_stale(position):
+            return Response(
+                {'detail': 'Курсор устарел, нужна полная синхронизация.'},
+                status=status.HTTP_410_GONE
+            )
+
+        changes, has_more = get_changes(
+            position, query.validated_data.get('limit')
+        )
+        changed = defaultdict(list)
+        deleted = defaultdict(list)
+        for change in changes:
+            (deleted if change.deleted else changed)[change.kind].append(
+                change.object_id
+            )
+
+        return Response({
+            'tags': TagSerializer(
+                Tag.objects.filter(pk__in=changed['tag']), many=True
+            ).data,
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.filter(pk__in=changed['ingredient']),
+                many=True
+            ).data,
+            'recipes': self.get_recipes(changed['recipe']),
+            'deleted': {
+                'tags': deleted['tag'],
+                'ingredients': deleted['ingredient'],
+                'recipes': deleted['recipe'],
+            },
+            'next': (
+                encode_cursor(get_position(changes[-1])) if changes
+                else request.query_params.get('since')
+            ),
+            'has_more': has_more,
+        })
+
+    def get_recipes(self, recipe_ids):
+        if settings.COMPILED_READ_SERIALIZERS:
+            return CompiledSyncRecipeSerializer(self.request).serialize(
+                recipe_ids
+            )
+        return SyncRecipeSerializer(
+            Recipe.objects.filter(pk__in=recipe_ids).select_related(
+                'author'
+            ).prefetch_related('tags', 'recipe_ingredients__ingredient'),
+            many=True,
+            context={'request': self.request}
+        ).data
+
+
+def download_export(request, token):
+    """Файл по подписанной ссылке, без авторизации."""
+    return delivery.file_response(delivery.unsign(token))
@@ -4,4 +4,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.events import events_application  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Поток событий EVENTS_PATH обслуживается без Django."""
+    if scope['type'] == 'http' and scope['path'] == settings.EVENTS_PATH:
+        return await events_application(scope, receive, send)
+    return await django_application(scope, receive, send)
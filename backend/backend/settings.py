@@ -32,17 +32,21 @@ INSTALLED_APPS = [
     'django_filters',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.PrecompressedResponseMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -73,6 +77,7 @@ if USE_SQLITE:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 0)),
         }
     }
     print("⚠️ Используется база данных SQLite")
@@ -84,7 +89,8 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', 'localhost'),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 0)),
         }
     }
 
@@ -123,6 +129,47 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+EXPORTS_ROOT = os.getenv('EXPORTS_ROOT', os.path.join(BASE_DIR, 'exports'))
+EXPORTS_ACCEL_PREFIX = '/protected/exports/'
+USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', 'False') == 'True'
+EXPORTS_LINK_MAX_AGE = int(os.getenv('EXPORTS_LINK_MAX_AGE', 60 * 10))
+EXPORTS_MAX_AGE = int(os.getenv('EXPORTS_MAX_AGE', 60 * 60))
+
+# Без DEBUG локальный адрес даёт предупреждение api.W002.
+SITE_URL = os.getenv('SITE_URL', 'http://localhost').rstrip('/')
+SHARE_PAGES_ROOT = os.getenv(
+    'SHARE_PAGES_ROOT', os.path.join(BASE_DIR, 'share')
+)
+
+EVENTS_PATH = '/api/events/'
+EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'api.events.DatabaseBackend')
+EVENTS_POLL_INTERVAL = int(os.getenv('EVENTS_POLL_INTERVAL', 1))
+EVENTS_HEARTBEAT = int(os.getenv('EVENTS_HEARTBEAT', 15))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_REPLAY_LIMIT = int(os.getenv('EVENTS_REPLAY_LIMIT', 100))
+EVENTS_MAX_AGE = int(os.getenv('EVENTS_MAX_AGE', 60 * 60 * 24))
+EVENTS_CLEAN_INTERVAL = int(os.getenv('EVENTS_CLEAN_INTERVAL', 60 * 60))
+EVENTS_COMMIT_LAG = int(os.getenv('EVENTS_COMMIT_LAG', 10))
+
+PROFILES_ROOT = os.getenv(
+    'PROFILES_ROOT', os.path.join(BASE_DIR, 'profiles')
+)
+PROFILE_INTERVAL_MS = int(os.getenv('PROFILE_INTERVAL_MS', 1))
+PROFILES_KEEP = int(os.getenv('PROFILES_KEEP', 100))
+
+# warn - создать и вернуть id похожих в X-Duplicate-Of, reject - 400,
+# off - не проверять.
+DUPLICATE_RECIPE_POLICY = os.getenv('DUPLICATE_RECIPE_POLICY', 'warn')
+DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', 0.9))
+
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+SYNC_COMMIT_LAG = int(os.getenv('SYNC_COMMIT_LAG', 10))
+SYNC_TOMBSTONE_MAX_AGE = int(
+    os.getenv('SYNC_TOMBSTONE_MAX_AGE', 60 * 60 * 24 * 30)
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ORIGIN_WHITELIST = [
@@ -142,8 +189,95 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserTokenBucketThrottle',
+        'api.throttling.IPTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'download_shopping_cart': '10/min',
+        'download_shopping_cart_ip': '30/min',
+        'recipe_create': '30/hour',
+        'recipe_create_ip': '60/hour',
+        'recipe_lists': '60/min',
+        'recipe_lists_ip': '240/min',
+        'subscribe': '60/min',
+        'subscribe_ip': '240/min',
+        'ingredients': '120/min',
+        'ingredients_ip': '600/min',
+        'sync': '60/min',
+        'sync_ip': '240/min',
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
+# Кеш должен быть общим для backend, worker и events (в docker-compose -
+# Redis): сброс кеша из worker не дойдёт до LocMem других процессов.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+SHARED_CACHE = 'locmem' not in CACHES['default']['BACKEND']
+
+# С LocMem устаревшие после чужого сброса данные живут не дольше минуты.
+API_CACHE_TIMEOUT = int(os.getenv(
+    'API_CACHE_TIMEOUT', 60 * 60 * 24 if SHARED_CACHE else 60
+))
+
+# Путь и семейство, версия которого сбрасывает закешированные ответы.
+PRECOMPRESSED_PATHS = (
+    (r'^/api/tags/', 'catalogue'),
+    (r'^/api/ingredients/', 'catalogue'),
+    (r'^/api/recipes/(\d+/)?$', 'recipes'),
+)
+PRECOMPRESS_MIN_SIZE = int(os.getenv('PRECOMPRESS_MIN_SIZE', 1024))
+PRECOMPRESS_GZIP_LEVEL = int(os.getenv('PRECOMPRESS_GZIP_LEVEL', 9))
+# Сжатие идёт в запросе, на котором ответ попал в кеш: качество 11 на
+# списке ингредиентов стоит сотни миллисекунд, 5 - единицы.
+PRECOMPRESS_BROTLI_QUALITY = int(os.getenv('PRECOMPRESS_BROTLI_QUALITY', 5))
+
+COMPILED_READ_SERIALIZERS = os.getenv(
+    'COMPILED_READ_SERIALIZERS', 'True'
+) == 'True'
+
+RECIPE_TRENDING_WINDOW_DAYS = int(
+    os.getenv('RECIPE_TRENDING_WINDOW_DAYS', 7)
+)
+RECIPE_TRENDING_HALF_LIFE_HOURS = float(
+    os.getenv('RECIPE_TRENDING_HALF_LIFE_HOURS', 24)
+)
+RECIPE_SCORES_REFRESH_INTERVAL = int(
+    os.getenv('RECIPE_SCORES_REFRESH_INTERVAL', 60 * 15)
+)
+
+TIMELINE_SIZE = int(os.getenv('TIMELINE_SIZE', 500))
+TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', 5000))
+
+TASKS_EAGER = os.getenv('TASKS_EAGER', str(DEBUG)) == 'True'
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+JOBS_MAX_RETRY_DELAY = int(os.getenv('JOBS_MAX_RETRY_DELAY', 60 * 60))
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', 60 * 10))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_KEEP_DONE = int(os.getenv('JOBS_KEEP_DONE', 60 * 60 * 24))
+
+PURGE_CHUNK_SIZE = int(os.getenv('PURGE_CHUNK_SIZE', 1000))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -0,0 +1,20 @@
+"""
+Настройки gunicorn. Перед запуском воркеров очищается каталог
+метрик Prometheus, чтобы в /metrics не попали значения прошлого запуска.
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
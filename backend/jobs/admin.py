@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from . import queue
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'task', 'status', 'attempts', 'max_attempts', 'run_at',
+        'created', 'finished'
+    )
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'key')
+    readonly_fields = ('created', 'finished', 'locked_at', 'last_error')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        for job in queryset.filter(status=Job.FAILED):
+            Job.objects.filter(pk=job.pk).update(attempts=0, finished=None)
+            queue.requeue(job)
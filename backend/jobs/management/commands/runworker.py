@@ -0,0 +1,57 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = 'Выполнение фоновых задач из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда очередь опустеет.'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза в секундах между опросами пустой очереди.'
+        )
+
+    def stop(self, *args):
+        self.running = False
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        queue.schedule_periodic()
+        self.stdout.write('Воркер запущен.')
+        last_cleanup = 0
+        while self.running:
+            if time.monotonic() - last_cleanup > settings.JOBS_LOCK_TIMEOUT:
+                queue.release_stale()
+                queue.delete_finished(settings.JOBS_KEEP_DONE)
+                queue.schedule_periodic(delayed=True)
+                last_cleanup = time.monotonic()
+
+            job = queue.claim()
+            if job is None:
+                if options['burst']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.monotonic()
+            succeeded = queue.run(job)
+            elapsed = (time.monotonic() - started) * 1000
+            message = f'{job.task} #{job.pk}: {elapsed:.0f} мс'
+            if succeeded:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'{message}, попытка {job.attempts}/{job.max_attempts}'
+                ))
+        self.stdout.write('Воркер остановлен.')
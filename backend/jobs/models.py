@@ -0,0 +1,57 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+MAX_LENGTH_TASK_NAME = 200
+MAX_LENGTH_JOB_KEY = 200
+
+
+class Job(models.Model):
+    """Отложенный вызов задачи, сохранённый в базе."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField('Задача', max_length=MAX_LENGTH_TASK_NAME)
+    kwargs = models.JSONField('Аргументы', default=dict, blank=True)
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=MAX_LENGTH_JOB_KEY,
+        blank=True,
+        null=True,
+    )
+    status = models.CharField(
+        'Статус', max_length=16, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток')
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    locked_at = models.DateTimeField('Взята в работу', blank=True, null=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=Q(status='pending'),
+                name='unique_pending_job_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} ({self.get_status_display()})'
@@ -0,0 +1,190 @@
+"""
+Очередь фоновых задач в основной базе, без внешнего брокера.
+
+Задача - функция из модуля tasks любого приложения, объявленная
+декоратором @task. Вызов task.delay(**kwargs) ставит её в очередь после
+фиксации текущей транзакции, аргументы должны сериализоваться в JSON.
+Необязательный key делает постановку идемпотентной: пока в очереди есть
+задача с тем же ключом, новая не создаётся. Упавшая задача повторяется
+с экспоненциальной задержкой до max_attempts раз.
+
+Задача с every выполняется периодически: воркер ставит её при запуске,
+а после каждого выполнения она ставится снова через every секунд.
+
+Задачи выполняет manage.py runworker; при TASKS_EAGER они выполняются
+сразу в процессе, поставившем их в очередь.
+"""
+import random
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+PERIODIC_KEY = 'periodic:{task}'
+
+
+def task(func=None, *, max_attempts=None, every=None):
+    """
+    Регистрирует функцию как фоновую задачу.
+    every - период в секундах для периодической задачи без аргументов.
+    """
+    if func is None:
+        return partial(task, max_attempts=max_attempts, every=every)
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    func.max_attempts = max_attempts
+    func.every = every
+    func.delay = partial(enqueue, func)
+    TASKS[func.task_name] = func
+    return func
+
+
+def enqueue(func, key=None, countdown=0, **kwargs):
+    """
+    Ставит задачу в очередь после фиксации транзакции.
+    countdown - задержка запуска в секундах.
+    """
+    if settings.TASKS_EAGER:
+        transaction.on_commit(lambda: func(**kwargs))
+        return
+
+    def create():
+        Job.objects.bulk_create([Job(
+            task=func.task_name,
+            kwargs=kwargs,
+            key=key,
+            max_attempts=func.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            run_at=timezone.now() + timedelta(seconds=countdown),
+        )], ignore_conflicts=key is not None)
+
+    transaction.on_commit(create)
+
+
+def schedule(func, countdown=0):
+    """Ставит периодическую задачу, если она ещё не стоит в очереди."""
+    func.delay(
+        key=PERIODIC_KEY.format(task=func.task_name), countdown=countdown
+    )
+
+
+def schedule_periodic(delayed=False):
+    """
+    Ставит в очередь все периодические задачи: сразу или, с delayed,
+    через период - так восстанавливается цепочка, прерванная сбоем.
+    """
+    for func in TASKS.values():
+        if func.every:
+            schedule(func, countdown=func.every if delayed else 0)
+
+
+def claim():
+    """Забирает из очереди следующую готовую к запуску задачу."""
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.PENDING, run_at__lte=timezone.now()
+        ).order_by('run_at', 'pk').first()
+        if job is None:
+            return None
+        # Для SQLite, где select_for_update ничего не блокирует.
+        claimed = Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            attempts=job.attempts + 1,
+            locked_at=timezone.now(),
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def get_retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором, со случайным разбросом."""
+    delay = min(
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOBS_MAX_RETRY_DELAY,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run(job):
+    """Выполняет задачу и записывает результат; True при успехе."""
+    func = None
+    try:
+        func = TASKS[job.task]
+        func(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts and requeue(
+            job, get_retry_delay(job.attempts)
+        ):
+            return False
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED,
+            finished=timezone.now(),
+            last_error=job.last_error,
+            locked_at=None,
+        )
+        succeeded = False
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE, finished=timezone.now(), locked_at=None
+        )
+        succeeded = True
+
+    if func is not None and func.every:
+        schedule(func, countdown=func.every)
+    return succeeded
+
+
+def requeue(job, delay=0):
+    """
+    Возвращает задачу в очередь. False, если в очереди уже есть задача
+    с тем же ключом - тогда повтор не нужен.
+    """
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=job.last_error,
+                locked_at=None,
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def release_stale():
+    """Возвращает в очередь задачи, которые воркер взял и не завершил."""
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOBS_LOCK_TIMEOUT
+        ),
+    )
+    released = 0
+    for job in stale:
+        job.last_error = 'Воркер не завершил задачу.'
+        if job.attempts < job.max_attempts and requeue(job):
+            released += 1
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED,
+                finished=timezone.now(),
+                last_error=job.last_error,
+                locked_at=None,
+            )
+    return released
+
+
+def delete_finished(max_age):
+    """Удаляет выполненные задачи старше max_age секунд."""
+    return Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - timedelta(seconds=max_age),
+    ).delete()[0]
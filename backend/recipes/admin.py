@@ -6,7 +6,7 @@ from django.db import models
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
-from .mixins import RecipeCountMixin
+from .mixins import HiddenDeletionMixin, RecipeCountMixin
 from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag, User)
 
@@ -101,7 +101,7 @@ class HasSubscribersFilter(admin.SimpleListFilter):
 
 
 @admin.register(User)
-class UserAdmin(RecipeCountMixin, BaseUserAdmin):
+class UserAdmin(HiddenDeletionMixin, RecipeCountMixin, BaseUserAdmin):
     list_display = (
         'id',
         'username',
@@ -180,7 +180,7 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(HiddenDeletionMixin, admin.ModelAdmin):
     formfield_overrides = {
         models.ImageField: {'widget': AdminImageWidget},
     }
@@ -0,0 +1,113 @@
+"""
+Удаление пользователей и рецептов с большим числом связанных записей.
+
+Объект сразу помечается is_hidden и пропадает из API и админки, а сами
+записи удаляются фоновой задачей пачками по PURGE_CHUNK_SIZE, каждая
+пачка - в своей транзакции. Сначала удаляются зависимые записи, затем
+пачка самих объектов. Модели без обработчиков сигналов удаления
+удаляются одним DELETE без загрузки строк; для остальных используется
+Collector, но только в пределах пачки.
+"""
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CASCADE, DO_NOTHING
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import Signal
+from django.utils import timezone
+from jobs.queue import task
+
+from .models import Recipe, User
+
+# Отправляется после скрытия: instance и recipe_ids - скрытые вместе
+# с ним рецепты (у пользователя они скрываются UPDATE без сигналов).
+hidden = Signal()
+
+
+def hide(instance):
+    """Скрывает пользователя или рецепт и ставит удаление в очередь."""
+    instance.is_hidden = True
+    update_fields = ['is_hidden']
+    if isinstance(instance, User):
+        instance.is_active = False
+        update_fields.append('is_active')
+        recipes = Recipe.all_objects.filter(author=instance, is_hidden=False)
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        recipes.update(is_hidden=True, updated_at=timezone.now())
+    else:
+        update_fields.append('updated_at')
+        recipe_ids = [instance.pk]
+    instance.save(update_fields=update_fields)
+    hidden.send(
+        sender=type(instance), instance=instance, recipe_ids=recipe_ids
+    )
+
+    label = instance._meta.label
+    purge_hidden.delay(
+        label=label, pk=instance.pk, key=f'purge:{label}:{instance.pk}'
+    )
+
+
+@task
+def purge_hidden(label, pk):
+    purge(apps.get_model(label), [pk])
+
+
+def needs_collector(model):
+    """Нужно ли удалять записи модели через Collector."""
+    return (
+        pre_delete.has_listeners(model)
+        or post_delete.has_listeners(model)
+        or any(
+            relation.on_delete not in (CASCADE, DO_NOTHING)
+            for relation in get_candidate_relations_to_delete(model._meta)
+        )
+    )
+
+
+def purge(model, pks, chunk_size=None, progress=None):
+    """
+    Удаляет объекты и всё, что на них ссылается, пачками.
+    progress(model, deleted) вызывается после каждой пачки.
+    Возвращает Counter удалённых записей по моделям.
+    """
+    deleted = Counter()
+
+    def report(model, count):
+        deleted[model._meta.label] += count
+        if progress is not None:
+            progress(model, deleted[model._meta.label])
+
+    delete_chunk(
+        model, pks, chunk_size or settings.PURGE_CHUNK_SIZE, report
+    )
+    return deleted
+
+
+def delete_chunk(model, pks, chunk_size, report):
+    purge_related(model, pks, chunk_size, report)
+    queryset = model._base_manager.filter(pk__in=pks)
+    with transaction.atomic():
+        if needs_collector(model):
+            count = queryset.delete()[0]
+        else:
+            count = queryset._raw_delete(queryset.db)
+    report(model, count)
+
+
+def purge_related(model, pks, chunk_size, report):
+    for relation in get_candidate_relations_to_delete(model._meta):
+        if relation.on_delete is not CASCADE:
+            continue
+        related_model = relation.related_model
+        related_pks = related_model._base_manager.filter(
+            **{f'{relation.field.name}__in': pks}
+        ).order_by('pk').values_list('pk', flat=True)
+        while True:
+            chunk = list(related_pks[:chunk_size])
+            if not chunk:
+                break
+            delete_chunk(related_model, chunk, chunk_size, report)
@@ -0,0 +1,232 @@
+"""
+Поиск почти одинаковых рецептов (перепостов).
+
+Отпечаток рецепта строится по нормализованному названию и набору
+ingredient_id, без количеств и описания:
+- exact - 64-битный хеш канонической записи; совпадает у точных копий
+  и ищется по обычному индексу;
+- signature - MinHash-сигнатура множества токенов "ингредиент" и
+  "триграмма названия"; совпадение хешей сигнатуры оценивает
+  коэффициент Жаккара этих множеств. Кандидаты ищутся по полосам LSH,
+  как в minhash.find_similar.
+
+Дублем считается рецепт со сходством не ниже DUPLICATE_THRESHOLD.
+"""
+import hashlib
+import re
+import zlib
+from collections import namedtuple
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .minhash import (MAX_CANDIDATES, NUM_PERM, PRIME, A, B, compute_buckets,
+                      get_candidates)
+from .models import (FingerprintBand, Recipe, RecipeFingerprint,
+                     RecipeIngredient)
+
+SHINGLE_SIZE = 3
+CHUNK_SIZE = 1000
+
+Fingerprint = namedtuple('Fingerprint', ('exact', 'signature'))
+
+
+def normalize_name(name):
+    """Название без регистра, пунктуации и лишних пробелов."""
+    name = name.lower().replace('ё', 'е')
+    return ' '.join(re.sub(r'[\W_]+', ' ', name).split())
+
+
+def get_tokens(name, ingredient_ids):
+    name = f' {normalize_name(name)} '
+    tokens = {f'i:{ingredient_id}' for ingredient_id in ingredient_ids}
+    tokens.update(
+        f'n:{name[start:start + SHINGLE_SIZE]}'
+        for start in range(len(name) - SHINGLE_SIZE + 1)
+    )
+    return tokens
+
+
+def compute(name, ingredient_ids):
+    ingredient_ids = sorted(set(ingredient_ids))
+    canonical = (
+        f'{normalize_name(name)}|{",".join(map(str, ingredient_ids))}'
+    )
+    exact = int.from_bytes(
+        hashlib.blake2b(canonical.encode(), digest_size=8).digest(),
+        'big', signed=True
+    )
+    # crc32 - токен меньше 2^32, как того требуют хеши minhash.
+    tokens = np.array(
+        [zlib.crc32(token.encode())
+         for token in get_tokens(name, ingredient_ids)],
+        dtype=np.uint64,
+    )
+    signature = ((np.outer(tokens, A) + B) % PRIME).min(axis=0)
+    return Fingerprint(exact, signature.astype(np.uint32))
+
+
+def save_fingerprints(fingerprints):
+    """Сохраняет отпечатки {recipe_id: Fingerprint} вместо прежних."""
+    with transaction.atomic():
+        RecipeFingerprint.objects.filter(recipe_id__in=fingerprints).delete()
+        FingerprintBand.objects.filter(recipe_id__in=fingerprints).delete()
+        if not fingerprints:
+            return
+        RecipeFingerprint.objects.bulk_create(
+            RecipeFingerprint(
+                recipe_id=recipe_id,
+                exact=fingerprint.exact,
+                signature=fingerprint.signature.tobytes(),
+            )
+            for recipe_id, fingerprint in fingerprints.items()
+        )
+        buckets = compute_buckets(
+            [fingerprint.signature for fingerprint in fingerprints.values()]
+        )
+        FingerprintBand.objects.bulk_create(
+            FingerprintBand(recipe_id=recipe_id, band=band, bucket=bucket)
+            for recipe_id, recipe_buckets in zip(
+                fingerprints, buckets.tolist()
+            )
+            for band, bucket in enumerate(recipe_buckets)
+        )
+
+
+def update_fingerprints(recipe_ids):
+    """Пересчитывает отпечатки рецептов по данным из базы."""
+    names = dict(Recipe.all_objects.filter(
+        pk__in=recipe_ids
+    ).values_list('id', 'name'))
+    ingredients = {recipe_id: [] for recipe_id in names}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=names
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].append(ingredient_id)
+    save_fingerprints({
+        recipe_id: compute(name, ingredients[recipe_id])
+        for recipe_id, name in names.items()
+    })
+    return len(names)
+
+
+def get_similarity(rows, signature):
+    """Сходство сигнатур из строк (recipe_id, signature) с signature."""
+    matrix = np.frombuffer(
+        b''.join(bytes(row[1]) for row in rows), dtype=np.uint32
+    ).reshape(-1, NUM_PERM)
+    return (matrix == signature).mean(axis=1)
+
+
+def find_duplicates(fingerprint, threshold=None):
+    """
+    Видимые рецепты, похожие на отпечаток: список (recipe_id, сходство)
+    по убыванию сходства.
+    """
+    threshold = threshold or settings.DUPLICATE_THRESHOLD
+    exact = set(RecipeFingerprint.objects.filter(
+        exact=fingerprint.exact, recipe__is_hidden=False
+    ).values_list('recipe_id', flat=True)[:MAX_CANDIDATES])
+
+    candidates = get_candidates(
+        FingerprintBand.objects.filter(recipe__is_hidden=False),
+        compute_buckets(fingerprint.signature)[0].tolist()
+    )
+    rows = list(RecipeFingerprint.objects.filter(
+        recipe_id__in=candidates
+    ).exclude(recipe_id__in=exact).values_list('recipe_id', 'signature'))
+
+    duplicates = [(recipe_id, 1.0) for recipe_id in sorted(exact)]
+    if rows:
+        similarity = get_similarity(rows, fingerprint.signature)
+        duplicates += sorted(
+            (
+                (row[0], float(score))
+                for row, score in zip(rows, similarity)
+                if score >= threshold
+            ),
+            key=lambda duplicate: (-duplicate[1], duplicate[0])
+        )
+    return duplicates
+
+
+class DisjointSet:
+    """Система непересекающихся множеств для сборки групп дублей."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        while parent != item:
+            grandparent = self.parent[parent]
+            self.parent[item] = grandparent
+            item, parent = parent, grandparent
+        return item
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+    def groups(self):
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [
+            sorted(group) for group in groups.values() if len(group) > 1
+        ]
+
+
+def get_shared_groups(queryset, key_fields):
+    """Группы recipe_id с одинаковыми key_fields, чтением по индексу."""
+    rows = queryset.filter(recipe__is_hidden=False).order_by(
+        *key_fields
+    ).values_list(*key_fields, 'recipe_id').iterator(chunk_size=CHUNK_SIZE)
+    for _, group in groupby(rows, key=itemgetter(*range(len(key_fields)))):
+        recipe_ids = [row[-1] for row in group]
+        if len(recipe_ids) > 1:
+            yield recipe_ids
+
+
+def find_clusters(threshold=None):
+    """
+    Группы дублей среди всех видимых рецептов.
+
+    Пары не перебираются: точные копии собираются по индексу exact,
+    почти копии - по корзинам LSH. В корзине каждый рецепт сравнивается
+    только с первым, связанные пары объединяются через DisjointSet.
+    """
+    threshold = threshold or settings.DUPLICATE_THRESHOLD
+    clusters = DisjointSet()
+    for recipe_ids in get_shared_groups(
+        RecipeFingerprint.objects, ('exact',)
+    ):
+        for recipe_id in recipe_ids[1:]:
+            clusters.union(recipe_ids[0], recipe_id)
+
+    buckets = list(get_shared_groups(
+        FingerprintBand.objects, ('band', 'bucket')
+    ))
+    recipe_ids = list({
+        recipe_id for bucket in buckets for recipe_id in bucket
+    })
+    signatures = {}
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        signatures.update(RecipeFingerprint.objects.filter(
+            recipe_id__in=recipe_ids[start:start + CHUNK_SIZE]
+        ).values_list('recipe_id', 'signature'))
+
+    for bucket in buckets:
+        first, *others = bucket
+        rows = [(recipe_id, signatures[recipe_id]) for recipe_id in others]
+        similarity = get_similarity(
+            rows, np.frombuffer(bytes(signatures[first]), dtype=np.uint32)
+        )
+        for recipe_id, score in zip(others, similarity):
+            if score >= threshold:
+                clusters.union(first, recipe_id)
+    return clusters.groups()
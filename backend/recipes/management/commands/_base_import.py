@@ -1,5 +1,6 @@
 import json
 
+from api import cache
 from django.core.management.base import BaseCommand
 
 
@@ -16,6 +17,9 @@ class BaseImportCommand(BaseCommand):
                     (self.model(**item) for item in json.load(f)),
                     ignore_conflicts=True
                 )
+            # bulk_create не отправляет сигналы моделей.
+            if created_objects:
+                self.after_import()
 
             self.stdout.write(self.style.SUCCESS(
                 f'Успешно! Файл: {self.file_name}. '
@@ -26,3 +30,7 @@ class BaseImportCommand(BaseCommand):
             self.stdout.write(self.style.ERROR(
                 f'Ошибка при импорте файла {self.file_name}: {e}'
             ))
+
+    def after_import(self):
+        """Сброс закешированных ответов со справочниками."""
+        cache.invalidate_catalogue()
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.sync import delete_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Удаление устаревших отметок об удалении объектов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=settings.SYNC_TOMBSTONE_MAX_AGE,
+            help='Возраст отметок в секундах, после которого они удаляются.'
+        )
+
+    def handle(self, *args, **options):
+        deleted = delete_tombstones(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено отметок: {deleted}'))
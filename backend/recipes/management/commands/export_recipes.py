@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from recipes.transfer import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Экспорт рецептов в JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для записи, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество рецептов, читаемых из базы за раз.'
+        )
+        parser.add_argument(
+            '--embed-images', action='store_true',
+            help='Включить картинки в файл в base64.'
+        )
+
+    def handle(self, *args, **options):
+        lines = export_recipes(options['batch_size'], options['embed_images'])
+        if options['path'] == '-':
+            sys.stdout.writelines(lines)
+            return
+
+        count = 0
+        with open(options['path'], 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Экспортировано рецептов: {count}'
+        ))
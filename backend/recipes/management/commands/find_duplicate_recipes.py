@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.fingerprints import find_clusters, update_fingerprints
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Поиск групп почти одинаковых рецептов по отпечаткам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=float, default=settings.DUPLICATE_THRESHOLD,
+            help='Минимальное сходство рецептов в группе, от 0 до 1.'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать отпечатки всех рецептов перед поиском.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество рецептов в одной пачке пересчёта.'
+        )
+
+    def rebuild(self, batch_size):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        for start in range(0, len(recipe_ids), batch_size):
+            update_fingerprints(recipe_ids[start:start + batch_size])
+            self.stdout.write(
+                f'Отпечатков построено: '
+                f'{min(start + batch_size, len(recipe_ids))}'
+                f'/{len(recipe_ids)}'
+            )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.rebuild(options['batch_size'])
+        clusters = find_clusters(options['threshold'])
+        for cluster in sorted(clusters, key=len, reverse=True):
+            self.stdout.write(
+                f'{len(cluster)}: {", ".join(map(str, cluster))}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Групп дублей: {len(clusters)}, рецептов в них: '
+            f'{sum(len(cluster) for cluster in clusters)}'
+        ))
@@ -1,3 +1,4 @@
+from recipes import search
 from recipes.models import Ingredient
 
 from ._base_import import BaseImportCommand
@@ -7,3 +8,7 @@ class Command(BaseImportCommand):
     help = 'Импорт ингредиентов из JSON'
     model = Ingredient
     file_name = 'ingredients.json'
+
+    def after_import(self):
+        super().after_import()
+        search.reset_index()
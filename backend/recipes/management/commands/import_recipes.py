@@ -0,0 +1,71 @@
+import os
+
+from api import cache
+from django.core.management.base import BaseCommand, CommandError
+from recipes import search, tasks
+from recipes.transfer import import_batch, read_batches
+
+
+class Command(BaseCommand):
+    help = 'Импорт рецептов из JSON Lines с продолжением с места остановки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл, созданный export_recipes.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество рецептов в одной транзакции.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней импортированной строки, '
+                 'по умолчанию <path>.checkpoint.'
+        )
+
+    def read_checkpoint(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding='utf-8') as file:
+            return int(file.read().strip() or 0)
+
+    def write_checkpoint(self, path, position):
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            file.write(str(position))
+        os.replace(f'{path}.tmp', path)
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] or f'{options["path"]}.checkpoint'
+        skip = self.read_checkpoint(checkpoint)
+        if skip:
+            self.stdout.write(f'Продолжение со строки {skip + 1}.')
+
+        created = 0
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                for position, items in read_batches(
+                    file, options['batch_size'], skip
+                ):
+                    recipe_ids = import_batch(items) if items else []
+                    self.write_checkpoint(checkpoint, position)
+                    if recipe_ids:
+                        created += len(recipe_ids)
+                        tasks.update_signatures.delay(recipe_ids=recipe_ids)
+                        tasks.update_fingerprints.delay(
+                            recipe_ids=recipe_ids
+                        )
+                    self.stdout.write(
+                        f'Строк: {position}, создано рецептов: {created}'
+                    )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(
+                f'Импорт остановлен: {error!r}. '
+                f'Повторный запуск продолжит с {checkpoint}.'
+            )
+        finally:
+            if created:
+                cache.invalidate_catalogue()
+                search.reset_index()
+
+        os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Создано рецептов: {created}'
+        ))
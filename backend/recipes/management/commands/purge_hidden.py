@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from recipes.deletion import purge
+from recipes.models import Recipe, User
+
+
+class Command(BaseCommand):
+    help = 'Удаление скрытых пользователей и рецептов с выводом прогресса'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Количество записей, удаляемых в одной транзакции.'
+        )
+
+    def progress(self, model, deleted):
+        self.stdout.write(f'  {model._meta.verbose_name_plural}: {deleted}')
+
+    def handle(self, *args, **options):
+        for model in (User, Recipe):
+            pks = list(
+                model.all_objects.filter(is_hidden=True).values_list(
+                    'pk', flat=True
+                )
+            )
+            for pk in pks:
+                self.stdout.write(f'{model._meta.verbose_name} #{pk}:')
+                deleted = purge(
+                    model, [pk], options['chunk_size'], self.progress
+                )
+                self.stdout.write(self.style.SUCCESS(
+                    f'Удалено записей: {sum(deleted.values())}'
+                ))
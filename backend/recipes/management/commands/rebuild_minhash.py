@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from recipes.minhash import update_signatures
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт MinHash-сигнатур и индекса LSH для похожих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество рецептов в одной пачке.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            updated += update_signatures(recipe_ids[start:start + batch_size])
+            self.stdout.write(
+                f'Обработано рецептов: '
+                f'{min(start + batch_size, len(recipe_ids))}'
+                f'/{len(recipe_ids)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Сигнатур построено: {updated}'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+APPS = ('recipes', 'api', 'jobs')
+INITIAL = '0001_initial'
+
+
+class Command(BaseCommand):
+    help = (
+        'Отметка начальных миграций приложений, таблицы которых уже '
+        'созданы через migrate --run-syncdb'
+    )
+
+    def handle(self, *args, **options):
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        applied = executor.recorder.applied_migrations()
+        for app_label in APPS:
+            if (app_label, INITIAL) in applied:
+                continue
+            migration = executor.loader.get_migration(app_label, INITIAL)
+            # Те же таблицы и столбцы, что проверяет migrate --fake-initial.
+            if executor.detect_soft_applied(None, migration)[0]:
+                executor.recorder.record_applied(app_label, INITIAL)
+                self.stdout.write(f'Отмечена миграция {app_label}.{INITIAL}')
+        self.stdout.write(self.style.SUCCESS('Готово.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт рейтингов рецептов (popular и trending)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Пересчёт рейтингов рецептов...')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Обновлено рейтингов: {refresh_scores()}'
+        ))
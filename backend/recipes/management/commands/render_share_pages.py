@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.share import write_page
+
+
+class Command(BaseCommand):
+    help = 'Построение страниц предпросмотра для коротких ссылок рецептов'
+
+    def handle(self, *args, **options):
+        written = 0
+        for recipe in Recipe.objects.only(
+            'id', 'name', 'text', 'image', 'cooking_time'
+        ).iterator():
+            write_page(recipe)
+            written += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Страниц построено: {written}'
+        ))
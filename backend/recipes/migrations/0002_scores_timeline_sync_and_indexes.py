@@ -0,0 +1,264 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:23
+
+from django.conf import settings
+import django.contrib.auth.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FingerprintBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.BigIntegerField(verbose_name='Корзина')),
+            ],
+            options={
+                'verbose_name': 'Полоса отпечатка',
+                'verbose_name_plural': 'Полосы отпечатков',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.BigIntegerField(verbose_name='Корзина')),
+            ],
+            options={
+                'verbose_name': 'Полоса LSH',
+                'verbose_name_plural': 'Полосы LSH',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата события')),
+            ],
+            options={
+                'verbose_name': 'Событие о рецепте',
+                'verbose_name_plural': 'События о рецептах',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeFingerprint',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('exact', models.BigIntegerField(verbose_name='Точный отпечаток')),
+                ('signature', models.BinaryField(verbose_name='Сигнатура')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток рецепта',
+                'verbose_name_plural': 'Отпечатки рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular', models.PositiveIntegerField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Тренд')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('signature', models.BinaryField(verbose_name='Сигнатура')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура рецепта',
+                'verbose_name_plural': 'Сигнатуры рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('tag', 'Тег'), ('ingredient', 'Ингредиент')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый объект',
+                'verbose_name_plural': 'Удалённые объекты',
+            },
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', recipes.models.VisibleUserManager()),
+                ('all_objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Удаляется'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Удаляется'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['updated_at', 'id'], name='ingredient_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', 'id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['updated_at', 'id'], name='recipe_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cooking_time', 'id'], name='recipe_cooking_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'cooking_time', 'id'], name='recipe_author_cooking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['name', 'id'], name='recipe_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'name', 'id'], name='recipe_author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['updated_at', 'id'], name='tag_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popular', '-recipe'], name='recipescore_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipescore_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipefingerprint',
+            index=models.Index(fields=['exact'], name='fingerprint_exact_idx'),
+        ),
+        migrations.AddField(
+            model_name='recipeevent',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_events', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AddField(
+            model_name='recipeevent',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='recipeband',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='fingerprintband',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_bands', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_timeline_entry'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeevent',
+            index=models.Index(fields=['author', 'id'], name='recipeevent_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeband',
+            index=models.Index(fields=['band', 'bucket'], name='recipeband_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeband',
+            constraint=models.UniqueConstraint(fields=('recipe', 'band'), name='unique_recipe_band'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprintband',
+            index=models.Index(fields=['band', 'bucket'], name='fingerprintband_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='fingerprintband',
+            constraint=models.UniqueConstraint(fields=('recipe', 'band'), name='unique_fingerprint_band'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_scores_timeline_sync_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TombstonePrune',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pruned_until', models.DateTimeField(verbose_name='Отметки удалены по')),
+            ],
+            options={
+                'verbose_name': 'Очистка отметок об удалении',
+                'verbose_name_plural': 'Очистки отметок об удалении',
+            },
+        ),
+    ]
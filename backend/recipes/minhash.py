@@ -0,0 +1,139 @@
+"""
+Поиск похожих рецептов по составу ингредиентов.
+
+Сходство - коэффициент Жаккара множеств ingredient_id. Для каждого
+рецепта хранится MinHash-сигнатура из NUM_PERM хешей; сигнатура
+режется на BANDS полос, и рецепты с совпадающей полосой попадают
+в одну корзину LSH. Кандидаты ищутся по индексу (band, bucket);
+если их больше MAX_CANDIDATES, остаются те, у кого больше общих полос.
+Ранжируются кандидаты по доле совпавших хешей сигнатуры.
+"""
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import RecipeBand, RecipeIngredient, RecipeSignature
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MAX_CANDIDATES = 1000
+
+# Хеши h(x) = (a * x + b) mod p. При p < 2^31 и x < 2^32
+# произведение помещается в uint64 без переполнения.
+PRIME = np.uint64((1 << 31) - 1)
+_random = np.random.RandomState(20240101)
+A = _random.randint(1, PRIME, NUM_PERM, dtype=np.uint64)
+B = _random.randint(0, PRIME, NUM_PERM, dtype=np.uint64)
+FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def compute_signatures(recipe_ids):
+    """
+    Сигнатуры {recipe_id: uint32[NUM_PERM]} для рецептов с ингредиентами.
+    Хеши всех строк RecipeIngredient считаются одной матричной операцией,
+    минимумы по рецептам - через np.minimum.reduceat.
+    """
+    rows = np.array(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('recipe_id').values_list('recipe_id', 'ingredient_id'),
+        dtype=np.uint64,
+    ).reshape(-1, 2)
+    if not len(rows):
+        return {}
+
+    recipes, starts = np.unique(rows[:, 0], return_index=True)
+    hashes = (np.outer(rows[:, 1], A) + B) % PRIME
+    signatures = np.minimum.reduceat(hashes, starts, axis=0)
+    return dict(zip(recipes.tolist(), signatures.astype(np.uint32)))
+
+
+def compute_buckets(signatures):
+    """Номера корзин LSH: по одному int64 на каждую полосу сигнатуры."""
+    bands = np.asarray(signatures, dtype=np.uint64).reshape(-1, BANDS, ROWS)
+    buckets = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for row in range(ROWS):
+        buckets = (buckets ^ bands[:, :, row]) * FNV_PRIME
+    return buckets.view(np.int64)
+
+
+def update_signatures(recipe_ids):
+    """Пересчитывает сигнатуры и полосы LSH для указанных рецептов."""
+    recipe_ids = list(recipe_ids)
+    signatures = compute_signatures(recipe_ids)
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeBand.objects.filter(recipe_id__in=recipe_ids).delete()
+        if not signatures:
+            return 0
+
+        RecipeSignature.objects.bulk_create(
+            RecipeSignature(recipe_id=recipe_id, signature=signature.tobytes())
+            for recipe_id, signature in signatures.items()
+        )
+        buckets = compute_buckets(list(signatures.values()))
+        RecipeBand.objects.bulk_create(
+            RecipeBand(recipe_id=recipe_id, band=band, bucket=bucket)
+            for recipe_id, recipe_buckets in zip(signatures, buckets.tolist())
+            for band, bucket in enumerate(recipe_buckets)
+        )
+    return len(signatures)
+
+
+def get_signature(recipe_id):
+    signature = RecipeSignature.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('signature', flat=True).first()
+    if signature is None:
+        update_signatures([recipe_id])
+        signature = RecipeSignature.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('signature', flat=True).first()
+    if signature is None:
+        return None
+    return np.frombuffer(bytes(signature), dtype=np.uint32)
+
+
+def get_candidates(bands, buckets):
+    """
+    recipe_id из полос bands в тех же корзинах, что buckets, по убыванию
+    числа общих полос - не больше MAX_CANDIDATES.
+    """
+    return list(bands.filter(reduce(or_, (
+        Q(band=band, bucket=bucket) for band, bucket in enumerate(buckets)
+    ))).values('recipe_id').annotate(
+        shared=Count('pk')
+    ).order_by('-shared', 'recipe_id').values_list(
+        'recipe_id', flat=True
+    )[:MAX_CANDIDATES])
+
+
+def find_similar(recipe_id, limit=6):
+    """
+    Похожие рецепты: список (recipe_id, оценка Жаккара) по убыванию
+    сходства, без самого рецепта.
+    """
+    signature = get_signature(recipe_id)
+    if signature is None:
+        return []
+
+    candidates = get_candidates(
+        RecipeBand.objects.exclude(recipe_id=recipe_id),
+        compute_buckets(signature)[0].tolist()
+    )
+    rows = list(RecipeSignature.objects.filter(
+        recipe_id__in=candidates
+    ).values_list('recipe_id', 'signature'))
+    if not rows:
+        return []
+
+    matrix = np.frombuffer(
+        b''.join(bytes(row[1]) for row in rows), dtype=np.uint32
+    ).reshape(-1, NUM_PERM)
+    similarity = (matrix == signature).mean(axis=1)
+    best = np.argsort(-similarity, kind='stable')[:limit]
+    return [(rows[index][0], float(similarity[index])) for index in best]
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.db.models import Count, Q
+
+from . import deletion
 
 
 class RecipeCountMixin:
@@ -10,7 +12,9 @@ class RecipeCountMixin:
     def get_queryset(self, request):
         """Аннотируем QuerySet количеством связанных рецептов."""
         return super().get_queryset(request).annotate(
-            recipes_count_annotated=Count('recipes')
+            recipes_count_annotated=Count(
+                'recipes', filter=Q(recipes__is_hidden=False)
+            )
         )
 
     @admin.display(
@@ -19,3 +23,27 @@ class RecipeCountMixin:
     )
     def recipes_count(self, obj):
         return obj.recipes_count_annotated
+
+
+class HiddenDeletionMixin:
+    """
+    Миксин удаления через deletion.hide: объект сразу скрывается,
+    связанные записи удаляются в фоне. Страница подтверждения не собирает
+    связанные объекты, чтобы не загружать их в память.
+    """
+
+    def delete_model(self, request, obj):
+        deletion.hide(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            deletion.hide(obj)
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.model._meta.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
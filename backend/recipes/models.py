@@ -1,6 +1,7 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 MAX_LENGTH_TAG_NAME = 32
 MAX_LENGTH_TAG_SLUG = 32
@@ -11,6 +12,21 @@ MIN_AMOUNT = 1
 MIN_TIME = 1
 
 
+class VisibleManagerMixin:
+    """Менеджер без объектов, скрытых перед фоновым удалением."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
+class VisibleManager(VisibleManagerMixin, models.Manager):
+    pass
+
+
+class VisibleUserManager(VisibleManagerMixin, UserManager):
+    pass
+
+
 class User(AbstractUser):
     """Кастомная модель пользователя."""
     email = models.EmailField(
@@ -37,6 +53,10 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    is_hidden = models.BooleanField('Удаляется', default=False)
+
+    objects = VisibleUserManager()
+    all_objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -61,11 +81,17 @@ class Tag(models.Model):
         max_length=MAX_LENGTH_TAG_SLUG,
         unique=True,
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
         ordering = ('name',)
+        indexes = [
+            models.Index(
+                fields=['updated_at', 'id'], name='tag_updated_at_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -81,11 +107,17 @@ class Ingredient(models.Model):
         max_length=MAX_LENGTH_INGREDIENT_UNIT,
 
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        indexes = [
+            models.Index(
+                fields=['updated_at', 'id'], name='ingredient_updated_at_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['name', 'measurement_unit'],
@@ -137,12 +169,43 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    is_hidden = models.BooleanField('Удаляется', default=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', 'id'],
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['updated_at', 'id'], name='recipe_updated_at_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', 'id'],
+                name='recipe_cooking_time_idx'
+            ),
+            models.Index(
+                fields=['author', 'cooking_time', 'id'],
+                name='recipe_author_cooking_idx'
+            ),
+            models.Index(fields=['name', 'id'], name='recipe_name_idx'),
+            models.Index(
+                fields=['author', 'name', 'id'],
+                name='recipe_author_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -203,6 +266,11 @@ class UserRecipeRelation(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         abstract = True
@@ -265,3 +333,268 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'
+
+
+class RecipeScore(models.Model):
+    """
+    Рейтинг рецепта для сортировок popular и trending.
+    popular - число добавлений в избранное и корзину,
+    trending - те же добавления с затуханием по времени.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт',
+    )
+    popular = models.PositiveIntegerField('Популярность', default=0)
+    trending = models.FloatField('Тренд', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'],
+                name='recipescore_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='recipescore_trending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular} / {self.trending:.2f}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Заполняется при публикации рецепта (fan-out on write).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash-сигнатура набора ингредиентов рецепта."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт',
+    )
+    signature = models.BinaryField('Сигнатура')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class RecipeBand(models.Model):
+    """
+    Полоса LSH: рецепты с одинаковой корзиной хотя бы в одной полосе
+    становятся кандидатами в похожие.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='bands',
+        verbose_name='Рецепт',
+    )
+    band = models.PositiveSmallIntegerField('Полоса')
+    bucket = models.BigIntegerField('Корзина')
+
+    class Meta:
+        verbose_name = 'Полоса LSH'
+        verbose_name_plural = 'Полосы LSH'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'band'],
+                name='unique_recipe_band'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'],
+                name='recipeband_bucket_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.band} -> {self.bucket}'
+
+
+class Tombstone(models.Model):
+    """
+    Отметка об удалении рецепта, тега или ингредиента для
+    инкрементальной синхронизации клиентов.
+    """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KINDS = (
+        (RECIPE, 'Рецепт'),
+        (TAG, 'Тег'),
+        (INGREDIENT, 'Ингредиент'),
+    )
+
+    kind = models.CharField('Тип', max_length=16, choices=KINDS)
+    object_id = models.BigIntegerField('id объекта')
+    deleted_at = models.DateTimeField('Дата удаления', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+        indexes = [
+            models.Index(
+                fields=['deleted_at', 'id'], name='tombstone_deleted_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.object_id}'
+
+
+class TombstonePrune(models.Model):
+    """
+    Время последней удалённой отметки об удалении. Курсор синхронизации,
+    не новее него, мог пропустить удаления.
+    """
+    pruned_until = models.DateTimeField('Отметки удалены по')
+
+    class Meta:
+        verbose_name = 'Очистка отметок об удалении'
+        verbose_name_plural = 'Очистки отметок об удалении'
+
+    def __str__(self):
+        return f'По {self.pruned_until:%Y-%m-%d %H:%M:%S}'
+
+
+class RecipeEvent(models.Model):
+    """
+    Событие о новом рецепте. Рассылается подписчикам автора через
+    server-sent events; id события служит Last-Event-ID.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recipe_events',
+        verbose_name='Автор',
+    )
+    created = models.DateTimeField(
+        'Дата события',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Событие о рецепте'
+        verbose_name_plural = 'События о рецептах'
+        indexes = [
+            models.Index(
+                fields=['author', 'id'], name='recipeevent_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'#{self.pk}: {self.recipe}'
+
+
+class RecipeFingerprint(models.Model):
+    """
+    Отпечаток рецепта для поиска дублей: точный хеш названия и набора
+    ингредиентов и MinHash-сигнатура их шинглов.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint',
+        verbose_name='Рецепт',
+    )
+    exact = models.BigIntegerField('Точный отпечаток')
+    signature = models.BinaryField('Сигнатура')
+
+    class Meta:
+        verbose_name = 'Отпечаток рецепта'
+        verbose_name_plural = 'Отпечатки рецептов'
+        indexes = [
+            models.Index(fields=['exact'], name='fingerprint_exact_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class FingerprintBand(models.Model):
+    """Полоса LSH отпечатка: рецепты из одной корзины - кандидаты в дубли."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='fingerprint_bands',
+        verbose_name='Рецепт',
+    )
+    band = models.PositiveSmallIntegerField('Полоса')
+    bucket = models.BigIntegerField('Корзина')
+
+    class Meta:
+        verbose_name = 'Полоса отпечатка'
+        verbose_name_plural = 'Полосы отпечатков'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'band'],
+                name='unique_fingerprint_band'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'],
+                name='fingerprintband_bucket_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.band} -> {self.bucket}'
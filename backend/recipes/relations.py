@@ -0,0 +1,182 @@
+"""
+Добавление и удаление связей пользователя (избранное, корзина,
+подписки) одним запросом к базе.
+
+Добавление - INSERT ... SELECT из таблицы цели с ON CONFLICT DO NOTHING:
+существование цели проверяет сама вставка, а повторный запрос не
+падает на уникальном ограничении, а просто ничего не вставляет.
+Удаление - DELETE ... RETURNING. Сигналы post_save и post_delete
+отправляются вручную, поэтому счётчики и кеш обновляются как обычно.
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+
+NOT_FOUND = 'not_found'
+CREATED = 'created'
+EXISTS = 'exists'
+
+
+def get_target(model, target_field):
+    return model._meta.get_field(target_field).related_model
+
+
+def to_target_pk(model, target_field, value):
+    """id цели из параметра URL; None, если это не id."""
+    try:
+        return get_target(model, target_field)._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def target_exists(model, target_field, target_pk):
+    target_pk = to_target_pk(model, target_field, target_pk)
+    return target_pk is not None and get_target(
+        model, target_field
+    ).objects.filter(pk=target_pk).exists()
+
+
+def get_insert_sql(model, target_field, target_columns, connection):
+    """SQL вставки связи и значения её полей, кроме пользователя и цели."""
+    quote = connection.ops.quote_name
+    target = get_target(model, target_field)
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.name not in ('id', 'user', target_field)
+    ]
+    columns = ', '.join(quote(column) for column in (
+        model._meta.get_field('user').column,
+        model._meta.get_field(target_field).column,
+        *(field.column for field in fields),
+    ))
+    values = ', '.join(['%s', quote(target._meta.pk.column)] + [
+        '%s' for _ in fields
+    ])
+    where = f'{quote(target._meta.pk.column)} = %s'
+    if any(field.name == 'is_hidden' for field in target._meta.fields):
+        where += (
+            f' AND NOT {quote(target._meta.get_field("is_hidden").column)}'
+        )
+    select_target = (
+        f'SELECT {", ".join(quote(column) for column in target_columns)} '
+        f'FROM {quote(target._meta.db_table)} WHERE {where}'
+    )
+    insert = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+        f'SELECT {values} FROM {quote(target._meta.db_table)} '
+        f'WHERE {where} ON CONFLICT DO NOTHING '
+        f'RETURNING {quote(model._meta.pk.column)}'
+    )
+    return select_target, insert, fields
+
+
+def convert(field, value, connection):
+    """Значение из строки RETURNING в тип поля, как при обычном чтении."""
+    expression = field.get_col(field.model._meta.db_table)
+    for converter in (
+        connection.ops.get_db_converters(expression)
+        + field.get_db_converters(connection)
+    ):
+        value = converter(value, expression, connection)
+    return value
+
+
+def execute_insert(connection, select_target, insert, target_pk, params):
+    """Строка цели и id вставленной связи (None, если она уже была)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'WITH target AS ({select_target}), '
+                f'inserted AS ({insert}) '
+                f'SELECT target.*, (SELECT * FROM inserted) FROM target',
+                [target_pk, *params]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None, None
+            return row[:-1], row[-1]
+
+        # SQLite не поддерживает INSERT внутри WITH.
+        cursor.execute(insert, params)
+        inserted = cursor.fetchone()
+        cursor.execute(select_target, [target_pk])
+        return cursor.fetchone(), inserted[0] if inserted else None
+
+
+def add(model, user, target_field, target_pk, target_columns=('id',)):
+    """
+    Создаёт связь пользователя с целью.
+    Возвращает (результат, строка цели из target_columns или None).
+    """
+    target_pk = to_target_pk(model, target_field, target_pk)
+    if target_pk is None:
+        return NOT_FOUND, None
+    using = router.db_for_write(model)
+    connection = connections[using]
+    instance = model(user=user, **{f'{target_field}_id': target_pk})
+    select_target, insert, fields = get_insert_sql(
+        model, target_field, target_columns, connection
+    )
+    values = [
+        field.get_db_prep_save(getattr(instance, field.attname), connection)
+        for field in fields
+    ]
+    params = [user.pk, *values, target_pk]
+
+    try:
+        with transaction.atomic(using=using):
+            target_row, pk = execute_insert(
+                connection, select_target, insert, target_pk, params
+            )
+            if pk is not None:
+                instance.pk = pk
+                instance._state.adding = False
+                instance._state.db = using
+                post_save.send(
+                    sender=model, instance=instance, created=True,
+                    update_fields=None, raw=False, using=using
+                )
+    except IntegrityError:
+        # Цель удалили между чтением и вставкой.
+        return NOT_FOUND, None
+
+    if target_row is None:
+        return NOT_FOUND, None
+    if pk is None:
+        return EXISTS, target_row
+    return CREATED, target_row
+
+
+def remove(model, user, target_field, target_pk):
+    """Удаляет связь пользователя с целью; True, если она была."""
+    target_pk = to_target_pk(model, target_field, target_pk)
+    if target_pk is None:
+        return False
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = model._meta.concrete_fields
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(model._meta.db_table)} '
+                f'WHERE {quote(model._meta.get_field("user").column)} = %s '
+                f'AND {quote(model._meta.get_field(target_field).column)} '
+                f'= %s RETURNING '
+                f'{", ".join(quote(field.column) for field in fields)}',
+                [user.pk, target_pk]
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+
+        # Строка уже удалена, поэтому pre_delete не отправляется.
+        instance = model.from_db(
+            using, [field.attname for field in fields],
+            [
+                convert(field, value, connection)
+                for field, value in zip(fields, row)
+            ]
+        )
+        post_delete.send(sender=model, instance=instance, using=using)
+    return True
@@ -0,0 +1,101 @@
+"""
+Рейтинги рецептов для сортировок popular и trending.
+
+Добавление в избранное или корзину сразу меняет счётчики в RecipeScore.
+Затухание trending пересчитывается периодически командой
+refresh_recipe_scores по событиям из скользящего окна.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+RELATION_MODELS = (Favorite, ShoppingCart)
+
+
+def decay_weight(created, now=None):
+    """Вес события: 1 для нового, вдвое меньше за каждый период полураспада."""
+    age = (now or timezone.now()) - created
+    if age > timedelta(days=settings.RECIPE_TRENDING_WINDOW_DAYS):
+        return 0.0
+    half_life = timedelta(hours=settings.RECIPE_TRENDING_HALF_LIFE_HOURS)
+    return 0.5 ** (max(age, timedelta()) / half_life)
+
+
+def change_score(recipe_id, created, sign):
+    """Учитывает добавление (sign=1) или удаление (sign=-1) события."""
+    updated = RecipeScore.objects.filter(recipe_id=recipe_id).update(
+        popular=Greatest(F('popular') + sign, 0),
+        trending=Greatest(F('trending') + sign * decay_weight(created), 0),
+    )
+    if not updated and sign > 0:
+        RecipeScore.objects.bulk_create(
+            [RecipeScore(recipe_id=recipe_id)], ignore_conflicts=True
+        )
+        change_score(recipe_id, created, sign)
+
+
+def compute_scores(recipe_ids=None):
+    """Рейтинги {recipe_id: (popular, trending)} по всем событиям."""
+    now = timezone.now()
+    since = now - timedelta(days=settings.RECIPE_TRENDING_WINDOW_DAYS)
+    popular = Counter()
+    trending = Counter()
+    for model in RELATION_MODELS:
+        events = model.objects.all()
+        if recipe_ids is not None:
+            events = events.filter(recipe_id__in=recipe_ids)
+        popular.update(dict(
+            events.values_list('recipe_id').annotate(count=Count('pk'))
+            .order_by().iterator()
+        ))
+        for recipe_id, created in events.filter(
+            created__gte=since
+        ).values_list('recipe_id', 'created').iterator():
+            trending[recipe_id] += decay_weight(created, now)
+    return {
+        recipe_id: (popular[recipe_id], trending[recipe_id])
+        for recipe_id in popular.keys() | trending.keys()
+    }
+
+
+def refresh_scores(recipe_ids=None, batch_size=1000):
+    """
+    Пересчитывает рейтинги и создаёт недостающие строки RecipeScore.
+    Возвращает количество обновлённых строк.
+    """
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    RecipeScore.objects.bulk_create(
+        (
+            RecipeScore(recipe_id=recipe_id)
+            for recipe_id in recipes.filter(
+                score__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+    scores = compute_scores(recipe_ids)
+    changed = []
+    for recipe_id, popular, trending in RecipeScore.objects.filter(
+        recipe__in=recipes
+    ).values_list('recipe_id', 'popular', 'trending').iterator():
+        new_popular, new_trending = scores.get(recipe_id, (0, 0.0))
+        if popular != new_popular or abs(trending - new_trending) > 1e-6:
+            changed.append(RecipeScore(
+                recipe_id=recipe_id,
+                popular=new_popular,
+                trending=new_trending,
+            ))
+    RecipeScore.objects.bulk_update(
+        changed, ['popular', 'trending'], batch_size=batch_size
+    )
+    return len(changed)
@@ -0,0 +1,179 @@
+"""
+Поиск ингредиентов с опечатками.
+
+Запрос нормализуется: нижний регистр, ё -> е, латинские буквы,
+похожие на кириллические, в словах с кириллицей заменяются на русские.
+Результаты ранжируются: точное совпадение, затем совпадение по началу
+названия, затем по сходству триграмм.
+
+В PostgreSQL поиск идёт по GIN-индексу pg_trgm (оператор %> - сходство
+запроса со словами названия). В остальных базах используется индекс
+триграмм в памяти процесса; он перестраивается при изменении справочника.
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import (Case, CharField, F, FloatField, Func,
+                              IntegerField, Q, Value, When)
+from django.db.models.functions import Upper
+from django.db.models.lookups import PostgresOperatorLookup
+
+from .models import Ingredient
+
+INDEX_NAME = 'ingredient_name_trgm_idx'
+VERSION_KEY = 'search:ingredients-version'
+SIMILARITY_THRESHOLD = 0.5
+
+HOMOGLYPHS = str.maketrans('aceopxykmthb', 'асеорхукмтнв')
+CYRILLIC = re.compile('[а-яё]')
+SPACES = re.compile(r'\s+')
+
+
+@CharField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+def normalize(text):
+    words = SPACES.sub(' ', text.lower()).strip().split(' ')
+    return ' '.join(
+        word.translate(HOMOGLYPHS) if CYRILLIC.search(word) else word
+        for word in words
+    ).replace('ё', 'е')
+
+
+def create_index(using):
+    """Расширение pg_trgm и индекс триграмм по названию ингредиента."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON '
+            f'{connection.ops.quote_name(Ingredient._meta.db_table)} '
+            f'USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def search_postgresql(queryset, query, limit):
+    query = normalize(query).upper()
+    return queryset.alias(upper_name=Upper('name')).filter(
+        Q(upper_name__startswith=query)
+        | Q(upper_name__trigram_word_similar=query)
+    ).annotate(
+        rank=Case(
+            When(upper_name=query, then=0),
+            When(upper_name__startswith=query, then=1),
+            default=2,
+            output_field=IntegerField(),
+        ),
+        similarity=Func(
+            Value(query), F('upper_name'),
+            function='WORD_SIMILARITY', output_field=FloatField(),
+        ),
+    ).order_by('rank', '-similarity', 'name')[:limit]
+
+
+def trigrams(text):
+    grams = set()
+    for word in text.split(' '):
+        padded = f'  {word} '
+        grams.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return grams
+
+
+class NgramIndex:
+    """Индекс триграмм названий ингредиентов в памяти процесса."""
+
+    def __init__(self, rows):
+        rows = sorted(
+            (normalize(name), pk) for pk, name in rows
+        )
+        self.names = [name for name, _ in rows]
+        self.ids = np.array([pk for _, pk in rows], dtype=np.int64)
+        postings = defaultdict(list)
+        sizes = []
+        for position, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(position)
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self.postings = {
+            gram: np.array(positions, dtype=np.int32)
+            for gram, positions in postings.items()
+        }
+
+    def search(self, query, limit):
+        """id ингредиентов в порядке ранжирования."""
+        query = normalize(query)
+        start = bisect_left(self.names, query)
+        end = bisect_left(self.names, query + '\uffff', start)
+        found = list(range(start, min(end, start + limit)))
+
+        if len(found) < limit:
+            grams = trigrams(query)
+            hits = [
+                self.postings[gram] for gram in grams if gram in self.postings
+            ]
+            if hits:
+                # Доля триграмм запроса в названии; при равенстве выше
+                # названия без лишних слов (сходство Жаккара).
+                counts = np.bincount(
+                    np.concatenate(hits), minlength=len(self.names)
+                )
+                counts[start:end] = 0
+                similar = np.flatnonzero(
+                    counts >= SIMILARITY_THRESHOLD * len(grams)
+                )
+                union = self.sizes[similar] + len(grams) - counts[similar]
+                order = np.lexsort(
+                    (-counts[similar] / union, -counts[similar])
+                )
+                found.extend(similar[order][:limit - len(found)].tolist())
+
+        return self.ids[found].tolist()
+
+
+_index = {'version': None, 'index': None}
+
+
+def get_index():
+    version = cache.get_or_set(VERSION_KEY, 0, timeout=None)
+    if _index['version'] != version or _index['index'] is None:
+        _index['index'] = NgramIndex(
+            Ingredient.objects.values_list('pk', 'name')
+        )
+        _index['version'] = version
+    return _index['index']
+
+
+def reset_index():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def search_in_process(queryset, query, limit):
+    ids = get_index().search(query, limit)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    ))
+
+
+def search_ingredients(queryset, query, limit=None):
+    limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+    if connections[queryset.db].vendor == 'postgresql':
+        return search_postgresql(queryset, query, limit)
+    return search_in_process(queryset, query, limit)
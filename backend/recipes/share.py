@@ -0,0 +1,69 @@
+"""
+Страницы рецептов для предпросмотра ссылок.
+
+По короткой ссылке /s/<id>/ отдаётся статическая HTML-страница
+с тегами OpenGraph: её читают боты соцсетей и мессенджеров, а браузер
+сразу переходит на страницу рецепта во фронтенде. Страницы пишутся
+в SHARE_PAGES_ROOT при сохранении рецепта, и nginx отдаёт их без
+обращения к gunicorn. Если файла нет, страницу строит и сохраняет
+recipe_short_link_view.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.text import Truncator
+
+from .models import Recipe
+
+DESCRIPTION_WORDS = 30
+
+
+def get_path(recipe_id):
+    return os.path.join(settings.SHARE_PAGES_ROOT, f'{recipe_id}.html')
+
+
+def render_page(recipe):
+    return render_to_string('recipes/share.html', {
+        'recipe': recipe,
+        'description': (
+            f'{recipe.cooking_time} мин. '
+            f'{Truncator(recipe.text).words(DESCRIPTION_WORDS)}'
+        ),
+        'recipe_url': f'{settings.SITE_URL}/recipes/{recipe.pk}/',
+        'share_url': f'{settings.SITE_URL}/s/{recipe.pk}/',
+        'image_url': (
+            f'{settings.SITE_URL}{recipe.image.url}' if recipe.image else None
+        ),
+    })
+
+
+def write_page(recipe):
+    """Записывает страницу целиком: nginx не увидит её недописанной."""
+    content = render_page(recipe)
+    os.makedirs(settings.SHARE_PAGES_ROOT, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=settings.SHARE_PAGES_ROOT, suffix='.tmp'
+    )
+    with os.fdopen(descriptor, 'w') as file:
+        file.write(content)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, get_path(recipe.pk))
+    return content
+
+
+def delete_page(recipe_id):
+    try:
+        os.remove(get_path(recipe_id))
+    except FileNotFoundError:
+        pass
+
+
+def update_page(recipe_id):
+    """Перестраивает страницу рецепта или удаляет её, если рецепта нет."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:
+        delete_page(recipe_id)
+    else:
+        write_page(recipe)
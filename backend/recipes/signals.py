@@ -0,0 +1,114 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import scores, search, share, sync, tasks, timeline
+from .models import (Favorite, Follow, Ingredient, Recipe, RecipeEvent,
+                     RecipeScore, ShoppingCart, Tag, Tombstone, User)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.bulk_create(
+            [RecipeScore(recipe=instance)], ignore_conflicts=True
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        tasks.fan_out_recipe.delay(
+            recipe_id=instance.pk, key=f'fan-out:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_event(sender, instance, created, **kwargs):
+    if created:
+        RecipeEvent.objects.create(
+            recipe=instance, author_id=instance.author_id
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def update_share_page(sender, instance, **kwargs):
+    tasks.update_share_page.delay(
+        recipe_id=instance.pk, key=f'share-page:{instance.pk}'
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_share_page(sender, instance, **kwargs):
+    share.delete_page(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, **kwargs):
+    if instance.image:
+        tasks.delete_files.delay(names=[instance.image.name])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def create_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        kind=sender._meta.model_name, object_id=instance.pk
+    )
+
+
+@receiver(pre_save, sender=User)
+def touch_author_recipes(sender, instance, update_fields=None, **kwargs):
+    fields = set(sync.AUTHOR_FIELDS)
+    if update_fields:
+        fields &= set(update_fields)
+    if instance.pk is None or not fields:
+        return
+    old = User.all_objects.filter(pk=instance.pk).values(*fields).first()
+    if old and any(
+        old[field] != User._meta.get_field(field).get_prep_value(
+            getattr(instance, field)
+        )
+        for field in fields
+    ):
+        sync.touch_author_recipes(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        tasks.backfill_timeline.delay(
+            user_id=instance.user_id, author_id=instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def add_score_event(sender, instance, created, **kwargs):
+    if created:
+        scores.change_score(instance.recipe_id, instance.created, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_score_event(sender, instance, **kwargs):
+    scores.change_score(instance.recipe_id, instance.created, -1)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_search_index(sender, **kwargs):
+    search.reset_index()
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    if sender.name == 'recipes' and connections[using].vendor == 'postgresql':
+        search.create_index(using)
@@ -0,0 +1,74 @@
+"""
+Статистика автора для его страницы.
+
+Число рецептов и среднее время приготовления, число подписчиков,
+сколько раз рецепты автора добавляли в избранное и самые частые теги
+считаются одним запросом: каждая величина - отдельная ветка UNION ALL,
+которая читает свою таблицу по индексу на автора. Подписки и избранное
+скрытых пользователей не считаются, хотя строки остаются до удаления.
+"""
+from django.db import connection
+
+from .models import Favorite, Follow, Recipe, Tag, User
+
+TOP_TAGS = 5
+
+RECIPES = 'recipes'
+FOLLOWERS = 'followers'
+FAVORITES = 'favorites'
+TAG = 'tag'
+
+
+def get_sql():
+    quote = connection.ops.quote_name
+    recipe = quote(Recipe._meta.db_table)
+    tags = quote(Recipe.tags.through._meta.db_table)
+    tag = quote(Tag._meta.db_table)
+    favorite = quote(Favorite._meta.db_table)
+    follow = quote(Follow._meta.db_table)
+    user = quote(User._meta.db_table)
+    visible = f'{recipe}.author_id = %s AND NOT {recipe}.is_hidden'
+    # Столбцы веток: вид, число, среднее, id, название и slug тега.
+    return (
+        f"SELECT '{RECIPES}', COUNT(*), AVG({recipe}.cooking_time), "
+        f'NULL, NULL, NULL FROM {recipe} WHERE {visible} '
+        f"UNION ALL SELECT '{FOLLOWERS}', COUNT(*), NULL, NULL, NULL, NULL "
+        f'FROM {follow} JOIN {user} ON {user}.id = {follow}.user_id '
+        f'WHERE {follow}.author_id = %s AND NOT {user}.is_hidden '
+        f"UNION ALL SELECT '{FAVORITES}', COUNT(*), NULL, NULL, NULL, NULL "
+        f'FROM {favorite} JOIN {recipe} '
+        f'ON {recipe}.id = {favorite}.recipe_id '
+        f'JOIN {user} ON {user}.id = {favorite}.user_id '
+        f'WHERE {visible} AND NOT {user}.is_hidden '
+        f'UNION ALL SELECT * FROM ('
+        f"SELECT '{TAG}', COUNT(*), NULL, {tag}.id, {tag}.name, {tag}.slug "
+        f'FROM {tags} JOIN {recipe} ON {recipe}.id = {tags}.recipe_id '
+        f'JOIN {tag} ON {tag}.id = {tags}.tag_id WHERE {visible} '
+        f'GROUP BY {tag}.id, {tag}.name, {tag}.slug '
+        f'ORDER BY COUNT(*) DESC, {tag}.id LIMIT %s) top_tags'
+    )
+
+
+def get_author_stats(author_id):
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(), [author_id] * 4 + [TOP_TAGS])
+        rows = cursor.fetchall()
+
+    stats = {
+        'recipes_count': 0,
+        'average_cooking_time': None,
+        'followers_count': 0,
+        'favorites_count': 0,
+        'top_tags': [],
+    }
+    for kind, count, average, tag_id, name, slug in rows:
+        if kind == TAG:
+            stats['top_tags'].append({
+                'id': tag_id, 'name': name, 'slug': slug,
+                'recipes_count': count,
+            })
+            continue
+        stats[f'{kind}_count'] = count
+        if average is not None:
+            stats['average_cooking_time'] = round(float(average), 1)
+    return stats
@@ -0,0 +1,136 @@
+"""
+Изменения справочников и рецептов для инкрементальной синхронизации.
+
+Все изменения - новые и изменённые теги, ингредиенты, рецепты и отметки
+об удалении - выстраиваются в один поток по (время, тип, id). Позиция в
+потоке - последнее отданное изменение; следующая страница читается по
+индексам (updated_at, id) каждой таблицы, без OFFSET.
+
+Время изменения ставится при сохранении, а видно другим соединениям
+становится только после фиксации транзакции. Поэтому изменения моложе
+SYNC_COMMIT_LAG секунд не отдаются: иначе позиция могла бы уйти вперёд
+записи, транзакция которой ещё не зафиксирована.
+
+В рецептах отдаются и данные автора, поэтому изменение профиля
+сдвигает updated_at всех его рецептов.
+"""
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Ingredient, Recipe, Tag, Tombstone, TombstonePrune
+
+Position = namedtuple('Position', ('time', 'rank', 'id'))
+Change = namedtuple(
+    'Change', ('time', 'rank', 'id', 'kind', 'object_id', 'deleted')
+)
+
+# Поля профиля, которые попадают в рецепты синхронизации.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+PRUNE_PK = 1
+
+SOURCES = (
+    (Tombstone.TAG, Tag.objects, 'updated_at'),
+    (Tombstone.INGREDIENT, Ingredient.objects, 'updated_at'),
+    (Tombstone.RECIPE, Recipe.all_objects, 'updated_at'),
+    (None, Tombstone.objects, 'deleted_at'),
+)
+
+
+def after(field, rank, position):
+    """Условие "строка источника rank идёт после позиции"."""
+    if position is None:
+        return Q()
+    if rank < position.rank:
+        return Q(**{f'{field}__gt': position.time})
+    if rank > position.rank:
+        return Q(**{f'{field}__gte': position.time})
+    return Q(**{f'{field}__gt': position.time}) | Q(
+        **{field: position.time, 'id__gt': position.id}
+    )
+
+
+def read_source(rank, position, until, limit):
+    kind, manager, field = SOURCES[rank]
+    queryset = manager.filter(
+        after(field, rank, position), **{f'{field}__lte': until}
+    ).order_by(field, 'id')[:limit]
+
+    if manager.model is Tombstone:
+        return [
+            Change(time, rank, pk, kind, object_id, True)
+            for time, pk, kind, object_id in queryset.values_list(
+                field, 'id', 'kind', 'object_id'
+            )
+        ]
+    if manager.model is Recipe:
+        # Скрытый перед удалением рецепт для клиента уже удалён.
+        rows = queryset.values_list(field, 'id', 'is_hidden')
+    else:
+        rows = (
+            (time, pk, False) for time, pk in queryset.values_list(field, 'id')
+        )
+    return [
+        Change(time, rank, pk, kind, pk, deleted)
+        for time, pk, deleted in rows
+    ]
+
+
+def get_changes(position=None, limit=None):
+    """
+    Не больше limit изменений после позиции и признак того,
+    что за ними есть ещё.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    until = timezone.now() - timedelta(seconds=settings.SYNC_COMMIT_LAG)
+    changes = list(islice(heapq.merge(*(
+        read_source(rank, position, until, limit + 1)
+        for rank in range(len(SOURCES))
+    )), limit + 1))
+    return changes[:limit], len(changes) > limit
+
+
+def get_position(change):
+    return Position(change.time, change.rank, change.id)
+
+
+@transaction.atomic
+def delete_tombstones(max_age):
+    """
+    Удаляет отметки об удалении старше max_age секунд и запоминает
+    время последней из них.
+    """
+    tombstones = Tombstone.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(seconds=max_age)
+    )
+    pruned_until = tombstones.aggregate(
+        Max('deleted_at')
+    )['deleted_at__max']
+    if pruned_until is None:
+        return 0
+    deleted = tombstones.filter(deleted_at__lte=pruned_until).delete()[0]
+    TombstonePrune.objects.update_or_create(
+        pk=PRUNE_PK, defaults={'pruned_until': pruned_until}
+    )
+    return deleted
+
+
+def is_stale(position):
+    """Позиция не новее удалённых отметок: клиент мог пропустить удаления."""
+    pruned_until = TombstonePrune.objects.filter(pk=PRUNE_PK).values_list(
+        'pruned_until', flat=True
+    ).first()
+    return pruned_until is not None and position.time <= pruned_until
+
+
+def touch_author_recipes(author_id):
+    """Рецепты автора снова попадают в поток изменений."""
+    return Recipe.all_objects.filter(author_id=author_id).update(
+        updated_at=timezone.now()
+    )
@@ -0,0 +1,49 @@
+"""Фоновые задачи приложения: выполняются воркером очереди jobs."""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from jobs.queue import task
+
+from . import fingerprints, minhash, scores, share, timeline
+# Задача удаления объявлена рядом с логикой удаления.
+from .deletion import purge_hidden  # noqa: F401
+from .models import Recipe
+
+
+@task
+def fan_out_recipe(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is not None:
+        timeline.fan_out(recipe)
+
+
+@task
+def backfill_timeline(user_id, author_id):
+    timeline.backfill(user_id, author_id)
+
+
+@task
+def update_signatures(recipe_ids):
+    minhash.update_signatures(recipe_ids)
+
+
+@task
+def update_fingerprints(recipe_ids):
+    fingerprints.update_fingerprints(recipe_ids)
+
+
+@task
+def update_share_page(recipe_id):
+    share.update_page(recipe_id)
+
+
+@task
+def delete_files(names):
+    """Удаляет файлы, на которые больше не ссылаются модели."""
+    for name in names:
+        default_storage.delete(name)
+
+
+@task(every=settings.RECIPE_SCORES_REFRESH_INTERVAL)
+def refresh_scores():
+    """Пересчёт рейтингов: вес событий в trending убывает со временем."""
+    scores.refresh_scores()
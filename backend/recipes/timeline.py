@@ -0,0 +1,102 @@
+"""
+Лента рецептов авторов, на которых подписан пользователь.
+
+Новый рецепт сразу раскладывается по лентам подписчиков (fan-out on
+write), лента каждого пользователя ограничена TIMELINE_SIZE записями.
+Рецепты авторов с числом подписчиков больше TIMELINE_FANOUT_LIMIT
+не раскладываются, а подмешиваются при чтении (fan-out on read).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import Follow, Recipe, TimelineEntry, User
+
+CELEBRITIES_KEY = 'timeline:celebrities'
+CELEBRITIES_TIMEOUT = 60 * 10
+
+
+def get_celebrity_ids():
+    """Авторы, рецепты которых не раскладываются по лентам."""
+    def build():
+        return set(
+            Follow.objects.values_list('author').annotate(
+                followers_count=Count('pk')
+            ).filter(
+                followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+            ).values_list('author', flat=True)
+        )
+    return cache.get_or_set(CELEBRITIES_KEY, build, CELEBRITIES_TIMEOUT)
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей не больше TIMELINE_SIZE записей."""
+    size = settings.TIMELINE_SIZE
+    TimelineEntry.objects.filter(
+        user__in=user_ids,
+        pub_date__lt=Subquery(
+            TimelineEntry.objects.filter(
+                user=OuterRef('user')
+            ).order_by('-pub_date').values('pub_date')[size - 1:size]
+        )
+    ).delete()
+
+
+def fan_out(recipe, batch_size=1000):
+    """Добавляет рецепт в ленты подписчиков автора."""
+    if recipe.author_id in get_celebrity_ids():
+        return
+    follower_ids = list(
+        Follow.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True)
+    )
+    for start in range(0, len(follower_ids), batch_size):
+        batch = follower_ids[start:start + batch_size]
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, recipe=recipe, pub_date=recipe.pub_date
+                )
+                for user_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+        trim(batch)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты нового автора из подписок."""
+    if author_id in get_celebrity_ids():
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in Recipe.objects.filter(
+                author_id=author_id
+            ).values_list('pk', 'pub_date')[:settings.TIMELINE_SIZE]
+        ),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def feed_queryset(user, queryset=None):
+    """Рецепты ленты пользователя, новые первыми."""
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    condition = Q(pk__in=TimelineEntry.objects.filter(
+        user=user
+    ).values('recipe'))
+    celebrity_ids = get_celebrity_ids()
+    if celebrity_ids:
+        condition |= Q(author__in=User.objects.filter(
+            pk__in=celebrity_ids, authors__user=user
+        ))
+    return queryset.filter(condition).order_by('-pub_date', '-pk')
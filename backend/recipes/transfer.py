@@ -0,0 +1,210 @@
+"""
+Перенос рецептов между окружениями в формате JSON Lines.
+
+Одна строка - один рецепт вместе с автором, тегами и ингредиентами.
+Автор определяется по email, тег - по slug, ингредиент - по названию
+и единице измерения; недостающие создаются. Рецепт того же автора с тем
+же названием и датой публикации считается уже перенесённым, поэтому
+повторный импорт ничего не дублирует.
+"""
+import base64
+import json
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from .models import (Ingredient, Recipe, RecipeIngredient, RecipeScore, Tag,
+                     User)
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def export_recipes(batch_size=500, embed_images=False):
+    """Строки JSON Lines для всех рецептов, пачками по batch_size."""
+    last_pk = 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(pk__gt=last_pk).order_by(
+                'pk'
+            ).select_related('author').prefetch_related(
+                'tags', 'recipe_ingredients__ingredient'
+            )[:batch_size]
+        )
+        if not recipes:
+            return
+        for recipe in recipes:
+            yield json.dumps(
+                serialize_recipe(recipe, embed_images), ensure_ascii=False
+            ) + '\n'
+        last_pk = recipes[-1].pk
+
+
+def serialize_recipe(recipe, embed_images=False):
+    data = {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'author': {
+            field: getattr(recipe.author, field) for field in AUTHOR_FIELDS
+        },
+        'tags': [
+            {'name': tag.name, 'slug': tag.slug} for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'image': recipe.image.name or None,
+    }
+    if embed_images and recipe.image:
+        with recipe.image.open('rb') as image:
+            data['image_data'] = base64.b64encode(image.read()).decode()
+    return data
+
+
+def read_batches(lines, batch_size, skip=0):
+    """Пачки (номер последней строки, рецепты) из потока строк."""
+    lines = islice(lines, skip, None)
+    position = skip
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            return
+        position += len(batch)
+        yield position, [json.loads(line) for line in batch if line.strip()]
+
+
+def get_or_create_authors(items):
+    authors = {item['author']['email']: item['author'] for item in items}
+    User.objects.bulk_create(
+        (
+            User(**author, password=make_password(None))
+            for author in authors.values()
+        ),
+        ignore_conflicts=True,
+    )
+    found = dict(
+        User.objects.filter(email__in=authors).values_list('email', 'pk')
+    )
+    missing = set(authors) - set(found)
+    if missing:
+        raise ValueError(
+            f'Не удалось создать авторов (занят username?): '
+            f'{", ".join(sorted(missing))}'
+        )
+    return found
+
+
+def get_or_create_tags(items):
+    tags = {tag['slug']: tag for item in items for tag in item['tags']}
+    Tag.objects.bulk_create(
+        (Tag(**tag) for tag in tags.values()), ignore_conflicts=True
+    )
+    return dict(Tag.objects.filter(slug__in=tags).values_list('slug', 'pk'))
+
+
+def get_or_create_ingredients(items):
+    ingredients = {
+        (ingredient['name'], ingredient['measurement_unit'])
+        for item in items for ingredient in item['ingredients']
+    }
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in ingredients
+        ),
+        ignore_conflicts=True,
+    )
+    return {
+        (name, unit): pk
+        for pk, name, unit in Ingredient.objects.filter(
+            name__in={name for name, _ in ingredients}
+        ).values_list('pk', 'name', 'measurement_unit')
+    }
+
+
+def save_image(item):
+    if not item.get('image_data'):
+        return item.get('image')
+    return default_storage.save(
+        item['image'], ContentFile(base64.b64decode(item['image_data']))
+    )
+
+
+@transaction.atomic
+def import_batch(items):
+    """Создаёт рецепты пачки и возвращает id новых рецептов."""
+    authors = get_or_create_authors(items)
+    for item in items:
+        item['author_id'] = authors[item['author']['email']]
+        item['pub_date'] = parse_datetime(item['pub_date'])
+
+    existing = set(Recipe.objects.filter(
+        author_id__in=authors.values(),
+        name__in={item['name'] for item in items},
+    ).values_list('author_id', 'name', 'pub_date'))
+    items = [
+        item for item in items
+        if (item['author_id'], item['name'], item['pub_date']) not in existing
+    ]
+    if not items:
+        return []
+
+    tags = get_or_create_tags(items)
+    ingredients = get_or_create_ingredients(items)
+    recipes = [
+        Recipe(
+            author_id=item['author_id'],
+            name=item['name'],
+            text=item['text'],
+            cooking_time=item['cooking_time'],
+            image=save_image(item),
+        )
+        for item in items
+    ]
+    last_pk = Recipe.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+    Recipe.objects.bulk_create(recipes)
+    if recipes[0].pk is None:
+        # SQLite не возвращает id из bulk_create, а запись в базу
+        # внутри транзакции идёт монопольно.
+        for recipe, pk in zip(recipes, Recipe.objects.filter(
+            pk__gt=last_pk
+        ).order_by('pk').values_list('pk', flat=True)):
+            recipe.pk = pk
+
+    # auto_now_add заменяет дату публикации при вставке.
+    for recipe, item in zip(recipes, items):
+        recipe.pub_date = item['pub_date']
+    Recipe.objects.bulk_update(recipes, ['pub_date'])
+
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredients[
+                (ingredient['name'], ingredient['measurement_unit'])
+            ],
+            amount=ingredient['amount'],
+        )
+        for recipe, item in zip(recipes, items)
+        for ingredient in item['ingredients']
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tags[tag['slug']])
+        for recipe, item in zip(recipes, items)
+        for tag in item['tags']
+    )
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe=recipe) for recipe in recipes),
+        ignore_conflicts=True,
+    )
+    return [recipe.pk for recipe in recipes]
@@ -1,10 +1,16 @@
-from django.http import Http404
-from django.shortcuts import redirect
+from django.http import Http404, HttpResponse
 from recipes.models import Recipe
 
+from .share import write_page
+
 
 def recipe_short_link_view(request, pk):
-    """Контроллер для перенаправления по короткой ссылке."""
-    if not Recipe.objects.filter(pk=pk).exists():
+    """
+    Страница предпросмотра рецепта по короткой ссылке.
+    Обычно её отдаёт nginx из SHARE_PAGES_ROOT; сюда запрос доходит,
+    только если страница ещё не построена.
+    """
+    recipe = Recipe.objects.filter(pk=pk).first()
+    if recipe is None:
         raise Http404(f'Рецепт с id={pk} не найден.')
-    return redirect(f'/recipes/{pk}/')
+    return HttpResponse(write_page(recipe))